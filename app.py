@@ -1,29 +1,56 @@
-from flask import Flask, request, jsonify, render_template
-from supabase import create_client, Client
-from dotenv import load_dotenv
-import os
-import requests
-import uuid
-from datetime import datetime, timedelta, date
-import calendar
+import time
+from flask import Flask, render_template, request, g
 
 from config import Config
 from routes.auth import authFunctions
 from routes.weather import weatherFunctions
 from routes.location import locationFunctions
+from routes.metrics import metricsFunctions
+from services.metrics import observe_request, registry
+    
+def preload_shared_state():
+    # Called in the gunicorn master when running with --preload so that forked
+    # workers share these modules copy-on-write. Only imports happen here: no
+    # sockets, clients or SQLite connections may be opened before the fork.
+    import requests
+    from requests.adapters import HTTPAdapter
+    
+    if Config.DATABASE_BACKEND != 'memory':
+        import supabase
     
 def create_app():
+    if Config.PRELOAD_SHARED_STATE:
+        preload_shared_state()
+    
     app = Flask(__name__)
     app.config.from_object(Config)
     
     app.register_blueprint(authFunctions)
     app.register_blueprint(weatherFunctions)
     app.register_blueprint(locationFunctions)
+    app.register_blueprint(metricsFunctions)
+    
+    @app.before_request
+    def start_request_timer():
+        g.request_started_at = time.perf_counter()
+    
+    @app.after_request
+    def record_request_metrics(response):
+        started_at = g.pop('request_started_at', None)
+        if started_at is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            observe_request(request.blueprint, route, request.method, str(response.status_code), time.perf_counter() - started_at)
+            registry.maybe_flush()
+        return response
     
     @app.route('/')
     def home():
         return render_template('index.html')
     
+    if Config.FORECAST_REFRESH_ENABLED:
+        from services.refresh_scheduler import start_refresh_scheduler
+        start_refresh_scheduler()
+    
     return app
 
 if __name__ == '__main__':
@@ -0,0 +1,80 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_REQUEST_SCRIPT = '''
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+flask_app = app.create_app()
+created = time.perf_counter()
+response = flask_app.test_client().get('/')
+served = time.perf_counter()
+print(json.dumps({
+    'status_code': response.status_code,
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (served - started) * 1000
+}))
+'''
+
+
+def run_python(args, env=None):
+    return subprocess.run(
+        [sys.executable] + args,
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+
+def measure_import_times(top=15):
+    result = run_python(['-X', 'importtime', '-c', 'import app'])
+    modules = {}
+
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        modules[module.strip()] = {
+            'self_ms': int(self_us) / 1000,
+            'cumulative_ms': int(cumulative_us) / 1000
+        }
+
+    slowest = sorted(modules.items(), key=lambda item: item[1]['cumulative_ms'], reverse=True)[:top]
+    return dict(slowest)
+
+
+def measure_first_request(runs=5, preload=False):
+    env = dict(os.environ, PRELOAD_SHARED_STATE='true' if preload else 'false')
+    samples = []
+
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = run_python(['-c', FIRST_REQUEST_SCRIPT], env=env)
+        sample = json.loads(result.stdout.strip().splitlines()[-1])
+        sample['process_ms'] = (time.perf_counter() - started) * 1000
+        samples.append(sample)
+
+    return {
+        name: round(statistics.median(sample[name] for sample in samples), 2)
+        for name in ('import_ms', 'create_app_ms', 'first_request_ms', 'process_ms')
+    }
+
+
+if __name__ == '__main__':
+    report = {
+        'python': sys.version.split()[0],
+        'first_request': measure_first_request(),
+        'first_request_preloaded': measure_first_request(preload=True),
+        'slowest_imports': measure_import_times()
+    }
+    print(json.dumps(report, indent=2))
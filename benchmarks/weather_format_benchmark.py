@@ -0,0 +1,116 @@
+import json
+import random
+import timeit
+from datetime import datetime, timedelta
+
+from services.weather_format import build_daily_forecast_data
+from utils.conversions import celsius_to_fahrenheit
+from utils.weather_codes import get_weather_description, get_weather_icon
+
+WEATHER_CODES = [0, 1, 2, 3, 45, 48, 51, 53, 55, 61, 63, 65, 71, 73, 75, 95, 96, 99, 7]
+
+
+def build_sample_forecast(forecast_days, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    hours = [start + timedelta(hours=h) for h in range(24 * forecast_days)]
+    days = [start + timedelta(days=d) for d in range(forecast_days)]
+
+    daily_data = {
+        'time': [day.strftime('%Y-%m-%d') for day in days],
+        'weather_code': [rng.choice(WEATHER_CODES) for _ in days],
+        'temperature_2m_max': [rng.uniform(5, 35) for _ in days],
+        'temperature_2m_min': [rng.uniform(-15, 5) for _ in days],
+        'precipitation_probability_max': [rng.choice([None, 0, 35, 90]) for _ in days],
+        'wind_speed_10m_max': [rng.uniform(0, 30) for _ in days],
+        'relative_humidity_2m_mean': [rng.uniform(20, 95) for _ in days]
+    }
+    hourly_data = {
+        'time': [hour.strftime('%Y-%m-%dT%H:%M') for hour in hours],
+        'temperature_2m': [rng.uniform(-15, 35) for _ in hours],
+        'relative_humidity_2m': [rng.randint(10, 100) for _ in hours],
+        'weather_code': [rng.choice(WEATHER_CODES) for _ in hours],
+        'wind_speed_10m': [rng.uniform(0, 30) for _ in hours],
+        'wind_direction_10m': [rng.randint(0, 359) for _ in hours],
+        'precipitation_probability': [rng.choice([None, 0, 10, 80]) for _ in hours]
+    }
+    return daily_data, hourly_data
+
+
+# The formatter as it was before the single-pass rewrite, kept as the
+# reference for both output equality and timing.
+def legacy_build_hourly_weather_data(hourly_data, date_filter=None):
+    hourly_weather = []
+
+    for i, hour_time in enumerate(hourly_data['time']):
+        if date_filter:
+            hour_date = hour_time.split('T')[0]
+            if hour_date != date_filter:
+                continue
+
+        hour_temp_c = hourly_data['temperature_2m'][i]
+        hourly_weather.append({
+            'time': hour_time,
+            'temp_f': round(celsius_to_fahrenheit(hour_temp_c), 1),
+            'temp_c': round(hour_temp_c, 1),
+            'condition': get_weather_description(hourly_data['weather_code'][i]),
+            'icon': get_weather_icon(hourly_data['weather_code'][i], 1),
+            'chance_of_rain': hourly_data['precipitation_probability'][i] if hourly_data['precipitation_probability'][i] else 0,
+            'wind_mph': round(hourly_data['wind_speed_10m'][i], 1),
+            'wind_dir': 'N',
+            'humidity': hourly_data['relative_humidity_2m'][i]
+        })
+
+    return hourly_weather
+
+
+def legacy_build_daily_forecast_data(daily_data, hourly_data):
+    forecast = []
+
+    for i in range(len(daily_data['time'])):
+        date_str = daily_data['time'][i]
+        date_obj = datetime.strptime(date_str, '%Y-%m-%d')
+
+        forecast.append({
+            'date': date_str,
+            'day_name': date_obj.strftime('%A'),
+            'max_temp_f': round(celsius_to_fahrenheit(daily_data['temperature_2m_max'][i]), 1),
+            'max_temp_c': round(daily_data['temperature_2m_max'][i], 1),
+            'min_temp_f': round(celsius_to_fahrenheit(daily_data['temperature_2m_min'][i]), 1),
+            'min_temp_c': round(daily_data['temperature_2m_min'][i], 1),
+            'condition': get_weather_description(daily_data['weather_code'][i]),
+            'icon': get_weather_icon(daily_data['weather_code'][i], 1),
+            'chance_of_rain': daily_data['precipitation_probability_max'][i] if daily_data['precipitation_probability_max'][i] else 0,
+            'humidity': round(daily_data['relative_humidity_2m_mean'][i]),
+            'wind_mph': round(daily_data['wind_speed_10m_max'][i], 1),
+            'hourly': legacy_build_hourly_weather_data(hourly_data, date_filter=date_str)
+        })
+
+    return forecast
+
+
+def run(forecast_days, repeat=5, number=50):
+    daily_data, hourly_data = build_sample_forecast(forecast_days)
+
+    legacy_json = json.dumps(legacy_build_daily_forecast_data(daily_data, hourly_data))
+    current_json = json.dumps(build_daily_forecast_data(daily_data, hourly_data))
+    if legacy_json != current_json:
+        raise AssertionError(f"Formatter output differs from legacy output at {forecast_days} days")
+
+    legacy_time = min(timeit.repeat(
+        lambda: legacy_build_daily_forecast_data(daily_data, hourly_data), repeat=repeat, number=number
+    )) / number
+    current_time = min(timeit.repeat(
+        lambda: build_daily_forecast_data(daily_data, hourly_data), repeat=repeat, number=number
+    )) / number
+
+    print(
+        f"{forecast_days:>2} days: legacy {legacy_time * 1000:.3f} ms, "
+        f"single-pass {current_time * 1000:.3f} ms, "
+        f"speedup {legacy_time / current_time:.1f}x (output identical)"
+    )
+
+
+if __name__ == '__main__':
+    for forecast_days in (7, 16):
+        run(forecast_days)
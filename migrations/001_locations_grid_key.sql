@@ -0,0 +1,15 @@
+-- Canonical grid key for locations: latitude and longitude rounded half-up to
+-- 4 decimal places and stored as fixed-point integers, e.g. "407128:-740060".
+-- utils/location.get_location_grid_key produces the same value.
+
+alter table locations add column if not exists grid_key text;
+
+update locations
+set grid_key = round(latitude::numeric * 10000)::bigint || ':' || round(longitude::numeric * 10000)::bigint
+where grid_key is null;
+
+-- Rows that collapse onto the same grid key must be merged (and their
+-- user_locations / location_history repointed) before this index can be built.
+create unique index if not exists locations_grid_key_key on locations (grid_key);
+
+alter table locations alter column grid_key set not null;
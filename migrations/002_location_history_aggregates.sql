@@ -0,0 +1,25 @@
+-- Per-location monthly ('2024-03') and annual ('2024') climate aggregates,
+-- maintained by utils/climate_aggregates.update_climate_aggregates whenever
+-- utils/weather_history.store_weather_history writes location_history rows.
+-- The *_sum columns keep means exact when months are combined into years.
+-- location_id must use the same type as locations.id.
+
+create table if not exists location_history_aggregates (
+    id bigint generated by default as identity primary key,
+    location_id bigint not null references locations (id) on delete cascade,
+    period_type text not null check (period_type in ('month', 'year')),
+    period text not null,
+    day_count integer not null,
+    temperature_max_sum double precision not null,
+    temperature_min_sum double precision not null,
+    temperature_max_mean double precision not null,
+    temperature_min_mean double precision not null,
+    precipitation_total double precision not null,
+    wettest_date date,
+    wettest_precipitation double precision,
+    hottest_date date,
+    hottest_temperature double precision,
+    condition_counts jsonb not null default '{}'::jsonb,
+    updated_at timestamptz not null default now(),
+    unique (location_id, period_type, period)
+);
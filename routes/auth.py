@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify
-from utils.user import validate_email, get_user_by_email, create_user
+from utils.user import validate_email, get_user_by_email, create_user, create_auth_token
 
 authFunctions = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -28,6 +28,7 @@ def auth_login():
             'status': 'success',
             'email': email,
             'user_id': user_data['id'],
+            'token': create_auth_token(user_data['id'], email),
             'user_status': user_status,
             'message': message
         })
@@ -1,17 +1,19 @@
 from flask import Blueprint, request, jsonify
-from utils.user import get_user_id_by_email
+from config import Config
+from utils.user import get_request_user_id
 from utils.location import (
     get_user_locations, find_or_create_location, 
     save_user_location, remove_user_location
 )
 from services.geocoding import search_location
+from services.location_index import suggest_locations, add_location
 
 locationFunctions = Blueprint('location', __name__)
 
 @locationFunctions.route('/get-locations/<email>')
 def get_user_locations_route(email):
     try:
-        user_id = get_user_id_by_email(email)
+        user_id = get_request_user_id(email)
         locations = get_user_locations(user_id)
         
         return jsonify({
@@ -54,6 +56,29 @@ def search_location_route():
             'message': f'Error searching location: {str(e)}'
         })
 
+@locationFunctions.route('/search-suggestions', methods=['POST'])
+def search_suggestions_route():
+    try:
+        data = request.json
+        location_query = data.get('location', '')
+        
+        if len(location_query.strip()) < 2:
+            return jsonify({
+                'status': 'success',
+                'suggestions': []
+            })
+        
+        return jsonify({
+            'status': 'success',
+            'suggestions': suggest_locations(location_query, Config.LOCATION_SUGGESTION_LIMIT)
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Error searching location: {str(e)}'
+        })
+
 @locationFunctions.route('/save-location', methods=['POST'])
 def save_location_route():
     try:
@@ -68,7 +93,7 @@ def save_location_route():
                 'message': 'Email and location data are required'
             })
         
-        user_id = get_user_id_by_email(email)
+        user_id = get_request_user_id(email)
         
         location_id = find_or_create_location(
             location_data['name'],
@@ -78,6 +103,14 @@ def save_location_route():
         
         saved_location, message = save_user_location(user_id, location_id, custom_name)
         
+        add_location({
+            'name': location_data['name'],
+            'region': location_data.get('region', ''),
+            'country': location_data.get('country', ''),
+            'latitude': location_data['latitude'],
+            'longitude': location_data['longitude']
+        })
+        
         if saved_location is None:
             return jsonify({
                 'status': 'error',
@@ -111,7 +144,7 @@ def remove_location_route():
                 'message': 'Email and location ID are required'
             })
         
-        user_id = get_user_id_by_email(email)
+        user_id = get_request_user_id(email)
         
         location_name, message = remove_user_location(user_id, user_location_id)
         
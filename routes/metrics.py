@@ -0,0 +1,58 @@
+import hmac
+from flask import Blueprint, Response, request
+from config import Config
+from services.metrics import registry, COUNTER, GAUGE
+from services.weather_api import forecast_cache
+from services.geocoding import geocoding_cache
+from services.singleflight import upstream_calls
+from services.http_client import get_connection_stats
+from utils.location import location_id_cache
+from utils.climatology import climatology_cache
+
+metricsFunctions = Blueprint('metrics', __name__)
+
+CACHES = {
+    'forecast': forecast_cache,
+    'geocoding': geocoding_cache,
+    'location_id': location_id_cache,
+    'climatology': climatology_cache
+}
+
+registry.describe('singleflight_leaders_total', COUNTER, 'Upstream calls made on behalf of concurrent identical requests.')
+registry.describe('singleflight_followers_total', COUNTER, 'Requests that waited on an identical in-flight upstream call.')
+registry.describe('singleflight_in_flight', GAUGE, 'Upstream calls currently in flight.')
+registry.describe('upstream_connections_total', COUNTER, 'Pooled connections opened per upstream host.')
+registry.describe('upstream_connection_requests_total', COUNTER, 'Requests sent over pooled connections per upstream host.')
+
+def collect_cache_metrics():
+    for cache_name, cache in CACHES.items():
+        stats = cache.stats()
+        labels = {'cache': cache_name}
+        yield 'cache_hits_total', labels, stats['hits']
+        yield 'cache_misses_total', labels, stats['misses']
+        yield 'cache_evictions_total', labels, stats['evictions']
+        yield 'cache_entries', labels, stats['entries']
+
+def collect_singleflight_metrics():
+    stats = upstream_calls.stats()
+    yield 'singleflight_leaders_total', {}, stats['leaders']
+    yield 'singleflight_followers_total', {}, stats['followers']
+    yield 'singleflight_in_flight', {}, stats['in_flight']
+
+def collect_connection_metrics():
+    for host, stats in get_connection_stats().items():
+        yield 'upstream_connections_total', {'host': host}, stats['connections']
+        yield 'upstream_connection_requests_total', {'host': host}, stats['requests']
+
+registry.add_collector(collect_cache_metrics)
+registry.add_collector(collect_singleflight_metrics)
+registry.add_collector(collect_connection_metrics)
+
+@metricsFunctions.route('/metrics')
+def metrics_route():
+    if Config.METRICS_TOKEN:
+        expected = f'Bearer {Config.METRICS_TOKEN}'
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), expected):
+            return Response('unauthorized\n', status=401, mimetype='text/plain')
+
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -1,29 +1,85 @@
 import calendar
-from datetime import datetime, date
+from datetime import date
 from flask import Blueprint, request, jsonify
-from utils.user import get_user_id_by_email
-from utils.location import get_user_location_with_details
+from config import Config
+from utils.user import get_request_user_id
+from utils.location import get_user_locations, get_user_location_with_details
 from utils.weather_history import (
-    check_weather_history_completeness, 
-    store_weather_history, 
+    find_missing_date_ranges, 
+    fill_weather_history_gaps, 
     get_weather_history_from_db
 )
-from services.weather_api import fetch_weather_data, fetch_historical_weather_data
+from utils.climate_aggregates import get_climate_aggregates, PERIOD_TYPES, MONTH_PERIOD
+from services.weather_api import (
+    fetch_weather_data, 
+    fetch_batch_weather_data, 
+    get_forecast_hours,
+    get_forecast_profile,
+    CURRENT_HOURLY_PROFILE
+)
 from services.weather_format import (
     build_weather_response, 
     build_current_weather_data,
     build_hourly_weather_data,
-    format_historical_weather_response
+    build_location_data,
+    get_current_hour_index,
+    parse_units,
+    parse_fields,
+    parse_coordinates,
+    format_historical_weather_response,
+    format_climate_aggregates,
+    FORECAST_FIELDS,
+    CURRENT_HOURLY_FIELDS,
+    OPTIONAL_FORECAST_FIELDS,
+    ALL_UNITS
+)
+from services.reverse_geocoding import describe_coordinates
+from utils.climatology import (
+    get_climatology,
+    get_climatologies,
+    get_climatology_version,
+    build_anomaly_column
+)
+from utils.http_cache import (
+    build_etag,
+    get_forecast_max_age,
+    is_not_modified,
+    not_modified_response,
+    conditional_jsonify,
+    compress_response
 )
-from utils.conversions import format_coordinates_location
 
 weatherFunctions = Blueprint('weather', __name__, url_prefix='/weather')
 
+CURRENT_HOURLY_LIMIT = 12
+
+def get_format_options(data=None, allowed_fields=FORECAST_FIELDS, optional_fields=OPTIONAL_FORECAST_FIELDS):
+    data = data or {}
+    units = parse_units(request.args.get('units') or data.get('units'))
+    fields = parse_fields(request.args.get('fields') or data.get('fields'), allowed_fields, optional_fields)
+    return units, fields
+
+@weatherFunctions.after_request
+def compress_weather_response(response):
+    return compress_response(response)
+
 @weatherFunctions.route('/nyc-forecast')
 def get_nyc_forecast():
     try:
         lat, lon = 40.7128, -74.0060
-        api_data = fetch_weather_data(lat, lon, forecast_days=7, timezone='America/New_York')
+        units, fields = get_format_options()
+        api_data = fetch_weather_data(
+            lat, lon, forecast_days=7, timezone='America/New_York', profile=get_forecast_profile(fields)
+        )
+        climatology = get_climatology(lat, lon) if 'anomalies' in fields else None
+        
+        etag = build_etag(
+            'nyc-forecast', api_data.get('fetched_at'), units, sorted(fields), 
+            get_climatology_version(climatology)
+        )
+        max_age = get_forecast_max_age(api_data)
+        if is_not_modified(etag):
+            return not_modified_response(etag, max_age)
         
         location_info = {
             'name': 'New York City',
@@ -31,12 +87,13 @@ def get_nyc_forecast():
             'country': 'United States'
         }
         
-        weather_response = build_weather_response(api_data, location_info)
+        anomalies = build_anomaly_column(climatology, api_data['daily'], units)
+        weather_response = build_weather_response(api_data, location_info, units, fields, anomalies)
         
-        return jsonify({
+        return conditional_jsonify({
             'status': 'success',
             'data': weather_response
-        })
+        }, etag, max_age)
         
     except Exception as e:
         return jsonify({
@@ -57,27 +114,45 @@ def get_current_location_weather_hourly():
                 'message': 'Latitude and longitude are required'
             })
         
-        api_data = fetch_weather_data(lat, lon, forecast_days=1, timezone='auto')
-        location_info = format_coordinates_location(lat, lon, "Current Location")
+        units, fields = get_format_options(data, CURRENT_HOURLY_FIELDS, ())
+        api_data = fetch_weather_data(
+            lat, lon, 
+            timezone='auto', 
+            profile=CURRENT_HOURLY_PROFILE, 
+            forecast_hours=get_forecast_hours(CURRENT_HOURLY_LIMIT)
+        )
         
-        current_data = build_current_weather_data(api_data['current'])
-        hourly_data = build_hourly_weather_data(api_data['hourly'], limit=12)
+        # The hourly slice moves with the clock, so the current hour is part of
+        # the validator even when the cached upstream payload has not changed.
+        current_hour_index = get_current_hour_index(
+            api_data['hourly']['time'], api_data.get('utc_offset_seconds')
+        )
+        etag = build_etag(
+            'current-location-hourly', lat, lon, api_data.get('fetched_at'),
+            current_hour_index, units, sorted(fields)
+        )
+        max_age = get_forecast_max_age(api_data)
+        if is_not_modified(etag):
+            return not_modified_response(etag, max_age)
         
-        weather_response = {
-            'location': {
-                'name': location_info['name'],
-                'region': location_info['region'],
-                'country': location_info['country'],
-                'localtime': datetime.now().strftime('%Y-%m-%d %H:%M')
-            },
-            'current': current_data,
-            'hourly': hourly_data
-        }
+        weather_response = {}
+        if 'location' in fields:
+            location_info = describe_coordinates(lat, lon, "Current Location")
+            weather_response['location'] = build_location_data(location_info, api_data)
+        if 'current' in fields:
+            weather_response['current'] = build_current_weather_data(api_data['current'], units)
+        if 'hourly' in fields:
+            weather_response['hourly'] = build_hourly_weather_data(
+                api_data['hourly'],
+                limit=CURRENT_HOURLY_LIMIT,
+                utc_offset_seconds=api_data.get('utc_offset_seconds'),
+                units=units
+            )
         
-        return jsonify({
+        return conditional_jsonify({
             'status': 'success',
             'data': weather_response
-        })
+        }, etag, max_age)
         
     except Exception as e:
         return jsonify({
@@ -98,14 +173,123 @@ def get_location_forecast():
                 'message': 'Latitude and longitude are required'
             })
         
-        api_data = fetch_weather_data(lat, lon, forecast_days=7, timezone='auto')
-        location_info = format_coordinates_location(lat, lon, "Current Location")
+        units, fields = get_format_options(data)
+        api_data = fetch_weather_data(lat, lon, forecast_days=7, timezone='auto', profile=get_forecast_profile(fields))
+        climatology = get_climatology(lat, lon) if 'anomalies' in fields else None
         
-        weather_response = build_weather_response(api_data, location_info)
+        etag = build_etag(
+            'location-forecast', lat, lon, api_data.get('fetched_at'), units, sorted(fields), 
+            get_climatology_version(climatology)
+        )
+        max_age = get_forecast_max_age(api_data)
+        if is_not_modified(etag):
+            return not_modified_response(etag, max_age)
         
-        return jsonify({
+        location_info = None
+        if 'location' in fields:
+            location_info = describe_coordinates(lat, lon, "Current Location")
+        
+        anomalies = build_anomaly_column(climatology, api_data['daily'], units)
+        weather_response = build_weather_response(api_data, location_info, units, fields, anomalies)
+        
+        return conditional_jsonify({
             'status': 'success',
             'data': weather_response
+        }, etag, max_age)
+        
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Weather API error: {str(e)}'
+        })
+
+def get_forecast_results(locations, units=ALL_UNITS, fields=FORECAST_FIELDS):
+    results = [None] * len(locations)
+    coordinates = []
+    coordinate_indexes = []
+    
+    for index, location in enumerate(locations):
+        # Each location is validated on its own so one bad entry is reported
+        # against that location instead of failing the whole upstream batch.
+        try:
+            if not isinstance(location, dict):
+                raise ValueError('Each location must be an object with latitude and longitude')
+            lat, lon = parse_coordinates(location.get('latitude'), location.get('longitude'))
+        except ValueError as e:
+            results[index] = {
+                'status': 'error',
+                'message': str(e)
+            }
+            continue
+        
+        coordinates.append((lat, lon))
+        coordinate_indexes.append(index)
+    
+    if not coordinates:
+        return results
+    
+    try:
+        forecast_data = fetch_batch_weather_data(
+            coordinates, forecast_days=7, timezone='auto', profile=get_forecast_profile(fields)
+        )
+    except Exception as e:
+        forecast_data = [e] * len(coordinates)
+    
+    if 'anomalies' in fields:
+        climatologies = get_climatologies(coordinates)
+    else:
+        climatologies = [None] * len(coordinates)
+    
+    for index, (lat, lon), api_data, climatology in zip(coordinate_indexes, coordinates, forecast_data, climatologies):
+        try:
+            if isinstance(api_data, Exception):
+                raise api_data
+            
+            location_info = None
+            if 'location' in fields:
+                location_info = describe_coordinates(lat, lon, "Current Location")
+                if locations[index].get('name'):
+                    location_info['name'] = locations[index]['name']
+            
+            results[index] = {
+                'status': 'success',
+                'data': build_weather_response(
+                    api_data, location_info, units, fields, 
+                    build_anomaly_column(climatology, api_data['daily'], units)
+                )
+            }
+        except Exception as e:
+            results[index] = {
+                'status': 'error',
+                'message': f'Weather service error: {str(e)}'
+            }
+    
+    return results
+
+@weatherFunctions.route('/batch-forecast', methods=['POST'])
+def get_batch_forecast():
+    try:
+        data = request.json
+        locations = data.get('locations')
+        
+        if not locations or not isinstance(locations, list):
+            return jsonify({
+                'status': 'error',
+                'message': 'A list of locations is required'
+            })
+        
+        if len(locations) > Config.BATCH_FORECAST_MAX_LOCATIONS:
+            return jsonify({
+                'status': 'error',
+                'message': f'At most {Config.BATCH_FORECAST_MAX_LOCATIONS} locations can be requested at once'
+            })
+        
+        units, fields = get_format_options(data)
+        results = get_forecast_results(locations, units, fields)
+        
+        return jsonify({
+            'status': 'success',
+            'data': results
         })
         
     except Exception as e:
@@ -114,6 +298,90 @@ def get_location_forecast():
             'message': f'Weather API error: {str(e)}'
         })
 
+@weatherFunctions.route('/dashboard', methods=['POST'])
+def get_dashboard():
+    try:
+        data = request.json
+        email = data.get('email')
+        
+        if not email:
+            return jsonify({
+                'status': 'error',
+                'message': 'Email is required'
+            })
+        
+        units, fields = get_format_options(data)
+        user_id = get_request_user_id(email)
+        locations = get_user_locations(user_id)
+        forecasts = get_forecast_results(locations, units, fields)
+        
+        for location, forecast in zip(locations, forecasts):
+            location['forecast'] = forecast
+        
+        return jsonify({
+            'status': 'success',
+            'locations': locations
+        })
+        
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Error loading dashboard: {str(e)}'
+        })
+
+def get_weather_history_result(user_location, start_date, end_date):
+    location_data = user_location['locations']
+    location_id = location_data['id']
+    
+    existing_records = get_weather_history_from_db(location_id, start_date, end_date)
+    missing_ranges = find_missing_date_ranges(existing_records, start_date, end_date)
+    
+    location_info = {
+        'name': user_location['custom_name'] or location_data['name'],
+        'region': '',
+        'country': '',
+        'latitude': location_data['latitude'],
+        'longitude': location_data['longitude']
+    }
+    
+    if not missing_ranges:
+        print(f"Using cached weather history for {location_data['name']} ({start_date} to {end_date})")
+        
+        response_data = format_historical_weather_response(existing_records, location_info)
+        response_data['from_cache'] = True
+        
+        return {
+            'status': 'success',
+            'data': response_data
+        }
+    
+    print(f"Fetching {len(missing_ranges)} missing date ranges from API for {location_data['name']} ({start_date} to {end_date})")
+    
+    try:
+        weather_records = fill_weather_history_gaps(
+            location_id,
+            location_data['latitude'],
+            location_data['longitude'],
+            existing_records,
+            missing_ranges
+        )
+        
+        response_data = format_historical_weather_response(weather_records, location_info)
+        response_data['from_cache'] = False
+        
+        return {
+            'status': 'success',
+            'data': response_data
+        }
+        
+    except Exception as api_error:
+        return {
+            'status': 'error',
+            'message': f'Failed to fetch historical weather data: {str(api_error)}'
+        }
+
 @weatherFunctions.route('/history', methods=['POST'])
 def get_weather_history():
     try:
@@ -129,7 +397,7 @@ def get_weather_history():
                 'message': 'Email, user_location_id, year, and month are required'
             })
         
-        user_id = get_user_id_by_email(email)
+        user_id = get_request_user_id(email)
         user_location = get_user_location_with_details(user_id, user_location_id)
         
         if not user_location:
@@ -138,9 +406,6 @@ def get_weather_history():
                 'message': 'Location not found or access denied'
             })
         
-        location_data = user_location['locations']
-        location_id = location_data['id']
-
         start_date = date(int(year), int(month), 1)
         last_day = calendar.monthrange(int(year), int(month))[1]
         end_date = date(int(year), int(month), last_day)
@@ -155,64 +420,72 @@ def get_weather_history():
                 'message': 'Cannot retrieve history for future dates'
             })
         
-        is_complete, existing_records = check_weather_history_completeness(location_id, start_date, end_date)
+        return jsonify(get_weather_history_result(user_location, start_date, end_date))
         
-        if is_complete:
-            print(f"Using cached weather history for {location_data['name']} ({year}-{month:02d})")
-            location_info = {
-                'name': user_location['custom_name'] or location_data['name'],
-                'region': '',
-                'country': '',
-                'latitude': location_data['latitude'],
-                'longitude': location_data['longitude']
-            }
-            
-            response_data = format_historical_weather_response(existing_records, location_info)
-            response_data['from_cache'] = True
-            
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Error retrieving weather history: {str(e)}'
+        })
+
+@weatherFunctions.route('/history-range', methods=['POST'])
+def get_weather_history_range():
+    try:
+        data = request.json
+        email = data.get('email')
+        user_location_id = data.get('user_location_id')
+        start_date_str = data.get('start_date')
+        end_date_str = data.get('end_date')
+        
+        if not all([email, user_location_id, start_date_str, end_date_str]):
             return jsonify({
-                'status': 'success',
-                'data': response_data
+                'status': 'error',
+                'message': 'Email, user_location_id, start_date, and end_date are required'
             })
         
-        else:
-            print(f"Fetching weather history from API for {location_data['name']} ({year}-{month:02d})")
-            
-            try:
-                api_data = fetch_historical_weather_data(
-                    float(location_data['latitude']),
-                    float(location_data['longitude']),
-                    start_date,
-                    end_date,
-                    'auto'
-                )
-                
-                stored_records = store_weather_history(location_id, api_data)
-                print(f"Stored {len(stored_records)} weather records")
-                
-                fresh_records = get_weather_history_from_db(location_id, start_date, end_date)
-                
-                location_info = {
-                    'name': user_location['custom_name'] or location_data['name'],
-                    'region': '',
-                    'country': '',
-                    'latitude': location_data['latitude'],
-                    'longitude': location_data['longitude']
-                }
-                
-                response_data = format_historical_weather_response(fresh_records, location_info)
-                response_data['from_cache'] = False
-                
-                return jsonify({
-                    'status': 'success',
-                    'data': response_data
-                })
-                
-            except Exception as api_error:
-                return jsonify({
-                    'status': 'error',
-                    'message': f'Failed to fetch historical weather data: {str(api_error)}'
-                })
+        try:
+            start_date = date.fromisoformat(start_date_str)
+            end_date = date.fromisoformat(end_date_str)
+        except ValueError:
+            return jsonify({
+                'status': 'error',
+                'message': 'Dates must be in YYYY-MM-DD format'
+            })
+        
+        today = date.today()
+        if end_date > today:
+            end_date = today
+        
+        if start_date > today:
+            return jsonify({
+                'status': 'error',
+                'message': 'Cannot retrieve history for future dates'
+            })
+        
+        if start_date > end_date:
+            return jsonify({
+                'status': 'error',
+                'message': 'start_date must be on or before end_date'
+            })
+        
+        if (end_date - start_date).days + 1 > Config.WEATHER_HISTORY_MAX_RANGE_DAYS:
+            return jsonify({
+                'status': 'error',
+                'message': f'History ranges are limited to {Config.WEATHER_HISTORY_MAX_RANGE_DAYS} days'
+            })
+        
+        user_id = get_request_user_id(email)
+        user_location = get_user_location_with_details(user_id, user_location_id)
+        
+        if not user_location:
+            return jsonify({
+                'status': 'error',
+                'message': 'Location not found or access denied'
+            })
+        
+        return jsonify(get_weather_history_result(user_location, start_date, end_date))
         
     except ValueError as e:
         return jsonify({'status': 'error', 'message': str(e)})
@@ -220,4 +493,57 @@ def get_weather_history():
         return jsonify({
             'status': 'error',
             'message': f'Error retrieving weather history: {str(e)}'
-        })
\ No newline at end of file
+        })
+
+@weatherFunctions.route('/climate', methods=['POST'])
+def get_climate_summary():
+    try:
+        data = request.json
+        email = data.get('email')
+        user_location_id = data.get('user_location_id')
+        period_type = data.get('period', MONTH_PERIOD)
+        start_period = data.get('start')
+        end_period = data.get('end')
+        
+        if not all([email, user_location_id]):
+            return jsonify({
+                'status': 'error',
+                'message': 'Email and user_location_id are required'
+            })
+        
+        if period_type not in PERIOD_TYPES:
+            return jsonify({
+                'status': 'error',
+                'message': f"period must be one of: {', '.join(PERIOD_TYPES)}"
+            })
+        
+        user_id = get_request_user_id(email)
+        user_location = get_user_location_with_details(user_id, user_location_id)
+        
+        if not user_location:
+            return jsonify({
+                'status': 'error',
+                'message': 'Location not found or access denied'
+            })
+        
+        location_data = user_location['locations']
+        location_info = {
+            'name': user_location['custom_name'] or location_data['name'],
+            'latitude': location_data['latitude'],
+            'longitude': location_data['longitude']
+        }
+        
+        aggregate_rows = get_climate_aggregates(location_data['id'], period_type, start_period, end_period)
+        
+        return jsonify({
+            'status': 'success',
+            'data': format_climate_aggregates(aggregate_rows, location_info, period_type)
+        })
+        
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)})
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Error retrieving climate summary: {str(e)}'
+        })
@@ -1,20 +1,27 @@
-import requests
 from config import Config
+from services.http_client import http_get
+from services.cache import TTLCache, freeze_params
+from services.singleflight import upstream_calls
+from services.location_index import normalize_location_query, add_location
+
+geocoding_cache = TTLCache(Config.GEOCODING_CACHE_MAX_ENTRIES, Config.GEOCODING_CACHE_TTL)
 
 def search_location(location_query):
+    normalized_query = normalize_location_query(location_query)
+    
+    cached_location = geocoding_cache.get(normalized_query)
+    if cached_location is not None:
+        return dict(cached_location)
+    
     url = f"{Config.GEOCODING_API_URL}/search"
     params = {
-        'name': location_query,
+        'name': normalized_query,
         'count': 1,
         'language': 'en',
         'format': 'json'
     }
     
-    response = requests.get(url, params=params)
-    if response.status_code != 200:
-        raise Exception('Location search service unavailable. Please try again later.')
-    
-    geo_data = response.json()
+    geo_data = upstream_calls.do((url, freeze_params(params)), request_geocoding_data, url, params)
     
     if not geo_data.get('results'):
         raise ValueError('Location not found. Please check the spelling and try again.')
@@ -33,10 +40,21 @@ def search_location(location_query):
     else:
         formatted_name = base_name
     
-    return {
+    location = {
         'name': formatted_name,
         'region': region,
         'country': country,
         'latitude': location_info['latitude'],
         'longitude': location_info['longitude']
-    }
\ No newline at end of file
+    }
+    
+    geocoding_cache.set(normalized_query, location)
+    add_location(location, normalized_query)
+    return dict(location)
+
+def request_geocoding_data(url, params):
+    response = http_get(url, params=params)
+    if response.status_code != 200:
+        raise Exception('Location search service unavailable. Please try again later.')
+    
+    return response.json()
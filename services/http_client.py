@@ -0,0 +1,80 @@
+import random
+import threading
+import time
+from urllib.parse import urlparse
+from config import Config
+from services.metrics import observe_upstream_request
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                # requests is imported here rather than at module level so it
+                # stays off the worker boot path until the first upstream call.
+                import requests
+                from requests.adapters import HTTPAdapter
+                
+                adapter = HTTPAdapter(
+                    pool_connections=Config.HTTP_POOL_HOSTS,
+                    pool_maxsize=Config.HTTP_POOL_SIZE,
+                    pool_block=True
+                )
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+def get_retry_delay(attempt):
+    delay = Config.HTTP_RETRY_BACKOFF * (2 ** attempt)
+    return random.uniform(0, min(delay, Config.HTTP_RETRY_BACKOFF_MAX))
+
+def http_get(url, params=None):
+    import requests
+    
+    session = get_session()
+    timeout = (Config.HTTP_CONNECT_TIMEOUT, Config.HTTP_READ_TIMEOUT)
+    host = urlparse(url).netloc
+    
+    for attempt in range(Config.HTTP_MAX_RETRIES + 1):
+        is_last_attempt = attempt == Config.HTTP_MAX_RETRIES
+        
+        started_at = time.perf_counter()
+        
+        try:
+            response = session.get(url, params=params, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout):
+            observe_upstream_request(host, 'error', time.perf_counter() - started_at)
+            if is_last_attempt:
+                raise
+        else:
+            observe_upstream_request(host, str(response.status_code), time.perf_counter() - started_at)
+            if response.status_code not in RETRYABLE_STATUS_CODES or is_last_attempt:
+                return response
+            response.close()
+        
+        time.sleep(get_retry_delay(attempt))
+
+def get_connection_stats():
+    stats = {}
+    if _session is None:
+        return stats
+    
+    pools = _session.get_adapter('https://').poolmanager.pools
+    for pool_key in pools.keys():
+        pool = pools.get(pool_key)
+        if pool is None:
+            continue
+        
+        host_stats = stats.setdefault(pool.host, {'requests': 0, 'connections': 0, 'reused': 0})
+        host_stats['requests'] += pool.num_requests
+        host_stats['connections'] += pool.num_connections
+        host_stats['reused'] += max(pool.num_requests - pool.num_connections, 0)
+    
+    return stats
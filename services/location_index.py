@@ -0,0 +1,93 @@
+import threading
+from collections import OrderedDict
+from config import Config
+
+def normalize_location_query(query):
+    return ' '.join(str(query).split()).casefold()
+
+
+class PrefixNode:
+    __slots__ = ('children', 'entry')
+
+    def __init__(self):
+        self.children = {}
+        self.entry = None
+
+
+class PrefixIndex:
+    # A trie over normalized keys, bounded by an LRU over those keys: adding a
+    # key costs O(len(key)) and the least recently resolved key is evicted
+    # once max_entries is exceeded.
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._root = PrefixNode()
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, key, entry):
+        key = normalize_location_query(key)
+        if not key or self.max_entries <= 0:
+            return
+
+        with self._lock:
+            node = self._root
+            for char in key:
+                node = node.children.setdefault(char, PrefixNode())
+            node.entry = entry
+
+            self._keys[key] = True
+            self._keys.move_to_end(key)
+            while len(self._keys) > self.max_entries:
+                evicted_key, _ = self._keys.popitem(last=False)
+                self._remove(evicted_key)
+
+    def _remove(self, key):
+        path = [self._root]
+        for char in key:
+            node = path[-1].children.get(char)
+            if node is None:
+                return
+            path.append(node)
+        path[-1].entry = None
+
+        for depth in range(len(key), 0, -1):
+            node = path[depth]
+            if node.entry is not None or node.children:
+                break
+            del path[depth - 1].children[key[depth - 1]]
+
+    def search(self, prefix, limit=10):
+        prefix = normalize_location_query(prefix)
+        matches = []
+        seen_names = set()
+
+        with self._lock:
+            node = self._root
+            for char in prefix:
+                node = node.children.get(char)
+                if node is None:
+                    return matches
+
+            stack = [node]
+            while stack and len(matches) < limit:
+                node = stack.pop()
+                if node.entry is not None and node.entry['name'] not in seen_names:
+                    seen_names.add(node.entry['name'])
+                    matches.append(node.entry)
+                stack.extend(node.children[char] for char in sorted(node.children, reverse=True))
+
+        return matches
+
+    def __len__(self):
+        with self._lock:
+            return len(self._keys)
+
+
+location_index = PrefixIndex(Config.LOCATION_INDEX_MAX_ENTRIES)
+
+def add_location(location, *queries):
+    for key in (location['name'], *queries):
+        location_index.add(key, location)
+
+def suggest_locations(prefix, limit=10):
+    return location_index.search(prefix, limit)
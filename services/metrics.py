@@ -0,0 +1,332 @@
+import atexit
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from config import Config
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+
+ARCHIVE_FILENAME = 'metrics_archive.json'
+LOCK_FILENAME = 'metrics.lock'
+
+
+def freeze_labels(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def escape_label_value(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label_value(value)}"' for name, value in pairs) + '}'
+
+
+def format_value(value):
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+def get_snapshot_identity(path):
+    # metrics_{pid}_{started_at}.json; the start time tells a recycled worker
+    # apart from an earlier one that had the same pid.
+    parts = os.path.basename(path)[len('metrics_'):-len('.json')].split('_')
+    if len(parts) != 2 or not all(part.isdigit() for part in parts):
+        return None
+    return int(parts[0]), int(parts[1])
+
+def merge_samples(target, samples):
+    for name, labels, value in samples:
+        key = (name, tuple(map(tuple, labels)))
+        target[key] = target.get(key, 0) + value
+
+def merge_histograms(target, histograms):
+    for name, labels, buckets, total, count in histograms:
+        key = (name, tuple(map(tuple, labels)))
+        merged = target.setdefault(key, [[0] * len(buckets), 0.0, 0])
+        merged[0] = [left + right for left, right in zip(merged[0], buckets)]
+        merged[1] += total
+        merged[2] += count
+
+def is_process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.descriptions = {}
+        self.counters = {}
+        self.histograms = {}
+        self.collectors = []
+        self._last_flush = 0.0
+        self._pid = None
+        self._started_at = None
+        self._lock = threading.Lock()
+
+    def describe(self, name, metric_type, help_text):
+        self.descriptions[name] = (metric_type, help_text)
+
+    def add_collector(self, collector):
+        # Collectors return (name, labels, value) samples read from state the
+        # process already keeps (cache and pool statistics), at snapshot time.
+        self.collectors.append(collector)
+
+    def inc(self, name, labels=None, value=1):
+        key = (name, freeze_labels(labels or {}))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=None):
+        key = (name, freeze_labels(labels or {}))
+        bucket_index = bisect_left(LATENCY_BUCKETS, value)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * (len(LATENCY_BUCKETS) + 1), 0.0, 0]
+            histogram[0][bucket_index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def snapshot(self):
+        with self._lock:
+            counters = [[name, list(labels), value] for (name, labels), value in self.counters.items()]
+            histograms = [
+                [name, list(labels), list(buckets), total, count]
+                for (name, labels), (buckets, total, count) in self.histograms.items()
+            ]
+
+        samples = []
+        for collector in self.collectors:
+            try:
+                samples.extend(
+                    [name, list(freeze_labels(labels)), value] for name, labels, value in collector()
+                )
+            except Exception as e:
+                print(f"Error collecting metrics from {collector.__name__}: {e}")
+
+        return {'pid': os.getpid(), 'counters': counters, 'histograms': histograms, 'samples': samples}
+
+    def get_snapshot_path(self):
+        # Taken per pid, so a worker forked from a preloaded master gets its own.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._started_at = time.time_ns() // 1000
+        return os.path.join(Config.METRICS_MULTIPROC_DIR, f'metrics_{self._pid}_{self._started_at}.json')
+
+    def flush(self):
+        if not Config.METRICS_MULTIPROC_DIR:
+            return
+
+        path = self.get_snapshot_path()
+        temporary_path = f'{path}.tmp'
+        try:
+            with open(temporary_path, 'w') as snapshot_file:
+                json.dump(self.snapshot(), snapshot_file)
+            os.replace(temporary_path, path)
+            self._last_flush = time.monotonic()
+        except OSError as e:
+            print(f"Error writing metrics snapshot: {e}")
+
+    def maybe_flush(self):
+        if Config.METRICS_MULTIPROC_DIR and time.monotonic() - self._last_flush >= Config.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def archive_exited_snapshots(self, snapshot_paths):
+        # Counters of exited workers are folded into one archive file and their
+        # snapshots deleted, so the directory does not grow as workers recycle
+        # and a reused pid cannot overwrite counts that were already reported.
+        latest_by_pid = {}
+        for path in snapshot_paths:
+            pid, started_at = get_snapshot_identity(path)
+            if started_at > latest_by_pid.get(pid, (-1, None))[0]:
+                latest_by_pid[pid] = (started_at, path)
+
+        # This worker's own state is read live, so any other file carrying its
+        # pid was left by an earlier process.
+        live_paths = {
+            path for pid, (_, path) in latest_by_pid.items()
+            if pid != os.getpid() and is_process_alive(pid)
+        }
+        exited_paths = [path for path in snapshot_paths if path not in live_paths]
+        if not exited_paths:
+            return live_paths
+
+        archive_path = os.path.join(Config.METRICS_MULTIPROC_DIR, ARCHIVE_FILENAME)
+        archive = self.read_snapshot(archive_path) or {'counters': [], 'histograms': []}
+        counters = {}
+        histograms = {}
+        merge_samples(counters, archive['counters'])
+        merge_histograms(histograms, archive['histograms'])
+
+        for path in exited_paths:
+            snapshot = self.read_snapshot(path)
+            if snapshot is None:
+                continue
+            merge_samples(counters, snapshot['counters'])
+            merge_samples(counters, [
+                sample for sample in snapshot['samples']
+                if self.descriptions.get(sample[0], (GAUGE, ''))[0] == COUNTER
+            ])
+            merge_histograms(histograms, snapshot['histograms'])
+
+        temporary_path = f'{archive_path}.tmp'
+        with open(temporary_path, 'w') as archive_file:
+            json.dump({
+                'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+                'histograms': [
+                    [name, list(labels), buckets, total, count]
+                    for (name, labels), (buckets, total, count) in histograms.items()
+                ]
+            }, archive_file)
+        os.replace(temporary_path, archive_path)
+
+        for path in exited_paths:
+            os.remove(path)
+        return live_paths
+
+    def read_snapshot(self, path):
+        try:
+            with open(path) as snapshot_file:
+                return json.load(snapshot_file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Error reading metrics snapshot {path}: {e}")
+            return None
+
+    def load_snapshots(self):
+        # Each gunicorn worker flushes its own snapshot file; the scraping
+        # worker merges them with its live state and the archive of exited
+        # workers, holding the directory lock so two scrapes cannot archive
+        # the same snapshot twice.
+        current = self.snapshot()
+        if not Config.METRICS_MULTIPROC_DIR:
+            return [current], []
+
+        current_path = self.get_snapshot_path()
+        lock_path = os.path.join(Config.METRICS_MULTIPROC_DIR, LOCK_FILENAME)
+        live_snapshots = [current]
+
+        with open(lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                snapshot_paths = [
+                    path for path in glob.glob(os.path.join(Config.METRICS_MULTIPROC_DIR, 'metrics_*.json'))
+                    if path != current_path and get_snapshot_identity(path) is not None
+                ]
+                try:
+                    live_paths = self.archive_exited_snapshots(snapshot_paths)
+                except OSError as e:
+                    print(f"Error archiving exited worker metrics: {e}")
+                    live_paths = snapshot_paths
+
+                for path in live_paths:
+                    snapshot = self.read_snapshot(path)
+                    if snapshot is not None:
+                        live_snapshots.append(snapshot)
+                archive = self.read_snapshot(os.path.join(Config.METRICS_MULTIPROC_DIR, ARCHIVE_FILENAME))
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+        return live_snapshots, [archive] if archive else []
+
+    def collect(self):
+        counters = {}
+        histograms = {}
+        live_snapshots, archives = self.load_snapshots()
+
+        for snapshot in live_snapshots:
+            merge_samples(counters, snapshot['counters'])
+            merge_samples(counters, snapshot['samples'])
+            merge_histograms(histograms, snapshot['histograms'])
+
+        for archive in archives:
+            merge_samples(counters, archive['counters'])
+            merge_histograms(histograms, archive['histograms'])
+
+        for (name, labels), hits in list(counters.items()):
+            if name != 'cache_hits_total':
+                continue
+            lookups = hits + counters.get(('cache_misses_total', labels), 0)
+            counters[('cache_hit_ratio', labels)] = round(hits / lookups, 4) if lookups else 0.0
+
+        return counters, histograms
+
+    def render(self):
+        counters, histograms = self.collect()
+        samples_by_name = {}
+        for (name, labels), value in counters.items():
+            samples_by_name.setdefault(name, []).append((labels, value))
+        for (name, labels), histogram in histograms.items():
+            samples_by_name.setdefault(name, []).append((labels, histogram))
+
+        lines = []
+        for name in sorted(samples_by_name):
+            metric_type, help_text = self.descriptions.get(name, (GAUGE, ''))
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+
+            for labels, value in sorted(samples_by_name[name]):
+                if metric_type != HISTOGRAM:
+                    lines.append(f'{name}{format_labels(labels)} {format_value(value)}')
+                    continue
+
+                buckets, total, count = value
+                cumulative = 0
+                for upper_bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{format_labels(labels, [("le", str(upper_bound))])} {cumulative}')
+                lines.append(f'{name}_bucket{format_labels(labels, [("le", "+Inf")])} {count}')
+                lines.append(f'{name}_sum{format_labels(labels)} {format_value(total)}')
+                lines.append(f'{name}_count{format_labels(labels)} {count}')
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+registry.describe('http_request_duration_seconds', HISTOGRAM, 'Flask request latency by blueprint, route, method and status.')
+registry.describe('upstream_request_duration_seconds', HISTOGRAM, 'Upstream HTTP attempt latency by host.')
+registry.describe('upstream_requests_total', COUNTER, 'Upstream HTTP attempts by host and status (error for connection failures).')
+registry.describe('database_request_duration_seconds', HISTOGRAM, 'Database round-trip latency by table and operation.')
+registry.describe('database_requests_total', COUNTER, 'Database round trips by table, operation and outcome.')
+registry.describe('cache_hits_total', COUNTER, 'In-process cache hits by cache.')
+registry.describe('cache_misses_total', COUNTER, 'In-process cache misses by cache.')
+registry.describe('cache_evictions_total', COUNTER, 'In-process cache LRU evictions by cache.')
+registry.describe('cache_entries', GAUGE, 'Entries currently held by each in-process cache, summed over live workers.')
+registry.describe('cache_hit_ratio', GAUGE, 'Hits over lookups by cache, across all workers since they started.')
+
+atexit.register(registry.flush)
+
+
+def observe_request(blueprint, route, method, status, seconds):
+    labels = {'blueprint': blueprint or '', 'route': route, 'method': method, 'status': status}
+    registry.observe('http_request_duration_seconds', seconds, labels)
+
+
+def observe_upstream_request(host, status, seconds):
+    registry.inc('upstream_requests_total', {'host': host, 'status': status})
+    registry.observe('upstream_request_duration_seconds', seconds, {'host': host})
+
+
+def observe_database_request(table, operation, outcome, seconds):
+    registry.inc('database_requests_total', {'table': table, 'operation': operation, 'outcome': outcome})
+    registry.observe('database_request_duration_seconds', seconds, {'table': table, 'operation': operation})
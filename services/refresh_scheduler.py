@@ -0,0 +1,194 @@
+import argparse
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from utils import db, forecast_store
+from services.weather_api import (
+    get_forecast_request,
+    get_cached_forecast_expires_in,
+    fetch_forecast_chunk,
+    FULL_FORECAST_PROFILE
+)
+
+def get_saved_locations_by_popularity():
+    locations = {}
+    page_size = Config.FORECAST_REFRESH_PAGE_SIZE
+    last_id = None
+
+    while True:
+        query = db.table('user_locations').select('id, location_id, locations(id, latitude, longitude)')
+        if last_id is not None:
+            query = query.gt('id', last_id)
+
+        page = query.order('id').limit(page_size).execute().data
+        for user_location in page:
+            location = user_location['locations']
+            if not location:
+                continue
+
+            saved_location = locations.setdefault(location['id'], {
+                'location_id': location['id'],
+                'latitude': location['latitude'],
+                'longitude': location['longitude'],
+                'saved_count': 0
+            })
+            saved_location['saved_count'] += 1
+
+        if len(page) < page_size:
+            break
+        last_id = page[-1]['id']
+
+    return sorted(locations.values(), key=lambda location: location['saved_count'], reverse=True)
+
+def get_due_forecast_requests(locations, refresh_ahead):
+    # Locations arrive most popular first, so this order decides who is
+    # refreshed when the upstream budget runs out.
+    due_requests = {}
+
+    for location in locations:
+        params, cache_key = get_forecast_request(
+            location['latitude'], location['longitude'],
+            forecast_days=7, timezone='auto', profile=FULL_FORECAST_PROFILE
+        )
+        if cache_key in due_requests:
+            continue
+
+        expires_in = get_cached_forecast_expires_in(cache_key)
+        if expires_in is None or expires_in <= refresh_ahead:
+            due_requests[cache_key] = params
+
+    return list(due_requests.items())
+
+def refresh_forecast_chunk(chunk):
+    try:
+        fetch_forecast_chunk(
+            [params for _, params in chunk],
+            [cache_key for cache_key, _ in chunk],
+            FULL_FORECAST_PROFILE
+        )
+        return True
+    except Exception as e:
+        print(f"Error refreshing {len(chunk)} forecasts: {e}")
+        return False
+
+def run_refresh_cycle(refresh_ahead=None, max_upstream_calls=None):
+    refresh_ahead = Config.FORECAST_REFRESH_AHEAD_SECONDS if refresh_ahead is None else refresh_ahead
+    max_upstream_calls = Config.FORECAST_REFRESH_MAX_UPSTREAM_CALLS if max_upstream_calls is None else max_upstream_calls
+    started_at = time.monotonic()
+
+    locations = get_saved_locations_by_popularity()
+    due_requests = get_due_forecast_requests(locations, refresh_ahead)
+
+    chunk_size = Config.BATCH_FORECAST_MAX_LOCATIONS
+    chunks = [due_requests[start:start + chunk_size] for start in range(0, len(due_requests), chunk_size)]
+    budgeted_chunks = chunks[:max(max_upstream_calls, 0)]
+
+    refreshed = failed = 0
+    if budgeted_chunks:
+        max_workers = min(Config.FORECAST_REFRESH_MAX_WORKERS, len(budgeted_chunks))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for chunk, succeeded in zip(budgeted_chunks, executor.map(refresh_forecast_chunk, budgeted_chunks)):
+                if succeeded:
+                    refreshed += len(chunk)
+                else:
+                    failed += len(chunk)
+
+    forecast_store.purge_expired()
+
+    summary = {
+        'locations': len(locations),
+        'due': len(due_requests),
+        'refreshed': refreshed,
+        'failed': failed,
+        'deferred': sum(len(chunk) for chunk in chunks[len(budgeted_chunks):]),
+        'upstream_calls': len(budgeted_chunks),
+        'duration_ms': round((time.monotonic() - started_at) * 1000, 1)
+    }
+    if due_requests:
+        print(
+            f"Forecast refresh: {summary['refreshed']} refreshed, {summary['failed']} failed, "
+            f"{summary['deferred']} deferred of {summary['due']} due across {summary['locations']} saved locations "
+            f"({summary['upstream_calls']} upstream calls, {summary['duration_ms']} ms)"
+        )
+    return summary
+
+REFRESH_LEASE_NAME = 'forecast_refresh'
+
+class RefreshScheduler:
+    # Every gunicorn worker that starts a scheduler competes for one lease in
+    # the shared forecast store, so only one of them refreshes per cycle.
+    # Without FORECAST_STORE_PATH there is nothing to share, and the in-app
+    # scheduler is only suitable for a single worker.
+    def __init__(self, interval=None, lease_seconds=None):
+        self.interval = Config.FORECAST_REFRESH_INTERVAL if interval is None else interval
+        lease_seconds = Config.FORECAST_REFRESH_LEASE_SECONDS if lease_seconds is None else lease_seconds
+        self.lease_seconds = max(lease_seconds, self.interval * 2)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{id(self)}"
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def run_once(self):
+        if not forecast_store.acquire_lease(REFRESH_LEASE_NAME, self.owner, self.lease_seconds):
+            return None
+        return run_refresh_cycle()
+
+    def run(self):
+        try:
+            while not self._stop.is_set():
+                try:
+                    self.run_once()
+                except Exception as e:
+                    print(f"Error running forecast refresh cycle: {e}")
+                self._stop.wait(self.interval)
+        finally:
+            forecast_store.release_lease(REFRESH_LEASE_NAME, self.owner)
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name='forecast-refresh', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+refresh_scheduler = RefreshScheduler()
+
+def start_refresh_scheduler():
+    if not forecast_store.is_enabled():
+        print("FORECAST_STORE_PATH is not set; run the forecast refresh scheduler with a single worker only")
+    refresh_scheduler.start()
+    return refresh_scheduler
+
+def main():
+    parser = argparse.ArgumentParser(description='Refresh saved-location forecasts before they expire from the cache.')
+    parser.add_argument('--once', action='store_true', help='run a single refresh cycle and exit')
+    parser.add_argument('--interval', type=int, default=Config.FORECAST_REFRESH_INTERVAL, help='seconds between cycles')
+    args = parser.parse_args()
+
+    if not forecast_store.is_enabled():
+        print("FORECAST_STORE_PATH is not set; refreshed forecasts will not be visible to app workers")
+
+    scheduler = RefreshScheduler(args.interval)
+    if args.once:
+        if scheduler.run_once() is None:
+            print("Another process holds the forecast refresh lease; skipping this cycle")
+        forecast_store.release_lease(REFRESH_LEASE_NAME, scheduler.owner)
+        return
+
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+import csv
+import math
+import threading
+from array import array
+from config import Config
+from utils.conversions import format_coordinates_location
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+class PlaceIndex:
+    def __init__(self, places, cell_degrees=1.0):
+        self.cell_degrees = cell_degrees
+        self.column_count = int(math.ceil(360 / cell_degrees))
+        self.latitudes = array('d')
+        self.longitudes = array('d')
+        self.places = []
+        self.cells = {}
+
+        for place in places:
+            index = len(self.places)
+            lat = float(place['latitude'])
+            lon = float(place['longitude'])
+
+            self.latitudes.append(lat)
+            self.longitudes.append(lon)
+            self.places.append({
+                'name': place['name'],
+                'region': place.get('region') or '',
+                'country': place.get('country') or ''
+            })
+            self.cells.setdefault((self.get_row(lat), self.get_column(lon)), array('I')).append(index)
+
+    def get_row(self, lat):
+        return int((lat + 90) // self.cell_degrees)
+
+    def get_column(self, lon):
+        return int((lon + 180) // self.cell_degrees) % self.column_count
+
+    def get_candidate_columns(self, lat, lon, max_distance_km):
+        polar_lat = min(abs(lat) + max_distance_km / KM_PER_DEGREE, 90)
+        cos_lat = math.cos(math.radians(polar_lat))
+        if cos_lat < 1e-6:
+            return range(self.column_count)
+
+        lon_span = max_distance_km / (KM_PER_DEGREE * cos_lat)
+        if lon_span >= 180:
+            return range(self.column_count)
+
+        first_column = int((lon - lon_span + 180) // self.cell_degrees)
+        last_column = int((lon + lon_span + 180) // self.cell_degrees)
+        return [column % self.column_count for column in range(first_column, last_column + 1)]
+
+    def nearest(self, lat, lon, max_distance_km):
+        lat_span = max_distance_km / KM_PER_DEGREE
+        first_row = self.get_row(max(lat - lat_span, -90))
+        last_row = self.get_row(min(lat + lat_span, 90))
+        columns = self.get_candidate_columns(lat, lon, max_distance_km)
+
+        lat_rad = math.radians(lat)
+        cos_lat = math.cos(lat_rad)
+        best_index = None
+        best_distance = max_distance_km
+
+        for row in range(first_row, last_row + 1):
+            for column in columns:
+                for index in self.cells.get((row, column), ()):
+                    other_lat = math.radians(self.latitudes[index])
+                    half_dlat = (other_lat - lat_rad) / 2
+                    half_dlon = math.radians(self.longitudes[index] - lon) / 2
+                    a = math.sin(half_dlat) ** 2 + cos_lat * math.cos(other_lat) * math.sin(half_dlon) ** 2
+                    distance = 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+                    if distance <= best_distance:
+                        best_index = index
+                        best_distance = distance
+
+        if best_index is None:
+            return None
+        return dict(self.places[best_index], distance_km=round(best_distance, 1))
+
+
+_place_index = None
+_place_index_lock = threading.Lock()
+
+def load_place_index():
+    with open(Config.REVERSE_GEOCODING_GAZETTEER_PATH, newline='', encoding='utf-8') as gazetteer:
+        return PlaceIndex(csv.DictReader(gazetteer), Config.REVERSE_GEOCODING_CELL_DEGREES)
+
+def get_place_index():
+    global _place_index
+    if _place_index is None:
+        with _place_index_lock:
+            if _place_index is None:
+                try:
+                    _place_index = load_place_index()
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"Error loading reverse geocoding gazetteer: {e}")
+                    _place_index = PlaceIndex([])
+    return _place_index
+
+def find_nearest_place(lat, lon):
+    return get_place_index().nearest(float(lat), float(lon), Config.REVERSE_GEOCODING_MAX_DISTANCE_KM)
+
+def describe_coordinates(lat, lon, default_prefix="Current Location"):
+    place = find_nearest_place(lat, lon)
+    if place is None:
+        return format_coordinates_location(lat, lon, default_prefix)
+    
+    return {
+        'name': place['name'],
+        'region': place['region'] or place['country'],
+        'country': place['country']
+    }
@@ -1,35 +1,243 @@
-import requests
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from config import Config
+from services.http_client import http_get
+from services.cache import TTLCache, freeze_params
+from services.singleflight import upstream_calls
+from utils import forecast_store
 
-def get_weather_params(lat, lon, forecast_days=7, timezone='auto'):
-    return {
-        'latitude': lat,
-        'longitude': lon,
+forecast_cache = TTLCache(Config.FORECAST_CACHE_MAX_ENTRIES, Config.FORECAST_CACHE_TTL)
+
+
+class ForecastPayloadError(Exception):
+    pass
+
+
+FULL_FORECAST_PROFILE = 'full'
+CURRENT_HOURLY_PROFILE = 'current_hourly'
+DAILY_ONLY_PROFILE = 'daily'
+
+WEATHER_PROFILES = {
+    FULL_FORECAST_PROFILE: {
         'current': ['temperature_2m', 'relative_humidity_2m', 'apparent_temperature', 
                    'weather_code', 'wind_speed_10m', 'wind_direction_10m', 'pressure_msl', 
                    'surface_pressure'],
         'daily': ['weather_code', 'temperature_2m_max', 'temperature_2m_min', 
                  'precipitation_probability_max', 'wind_speed_10m_max', 'relative_humidity_2m_mean'],
         'hourly': ['temperature_2m', 'relative_humidity_2m', 'weather_code', 
-                  'wind_speed_10m', 'wind_direction_10m', 'precipitation_probability'],
+                  'wind_speed_10m', 'wind_direction_10m', 'precipitation_probability']
+    },
+    CURRENT_HOURLY_PROFILE: {
+        'current': ['temperature_2m', 'relative_humidity_2m', 'apparent_temperature', 
+                   'weather_code', 'wind_speed_10m', 'pressure_msl'],
+        'hourly': ['temperature_2m', 'relative_humidity_2m', 'weather_code', 
+                  'wind_speed_10m', 'precipitation_probability']
+    },
+    DAILY_ONLY_PROFILE: {
+        'daily': ['weather_code', 'temperature_2m_max', 'temperature_2m_min', 
+                 'precipitation_probability_max', 'wind_speed_10m_max', 'relative_humidity_2m_mean']
+    }
+}
+
+def quantize_coordinate(value):
+    return round(float(value), Config.FORECAST_CACHE_COORD_DECIMALS)
+
+def get_forecast_hours(hour_limit):
+    # A cached response must still cover the next hour_limit hours when it is
+    # served at the end of its TTL, which can be a few hours after its first row.
+    return hour_limit + math.ceil(Config.FORECAST_CACHE_TTL / 3600)
+
+def get_weather_params(lat, lon, forecast_days=7, timezone='auto', profile=FULL_FORECAST_PROFILE, forecast_hours=None):
+    params = {
+        'latitude': lat,
+        'longitude': lon,
         'temperature_unit': 'celsius',
         'wind_speed_unit': 'mph',
         'precipitation_unit': 'mm',
-        'timezone': timezone,
-        'forecast_days': forecast_days
+        'timezone': timezone
     }
+    
+    for block, variables in WEATHER_PROFILES[profile].items():
+        params[block] = list(variables)
+    
+    if forecast_hours:
+        params['forecast_hours'] = forecast_hours
+    else:
+        params['forecast_days'] = forecast_days
+    
+    return params
+
+def get_forecast_profile(fields):
+    # Projections without current conditions or hourly rows only need the
+    # daily block; the profile is part of the cache key, so they are cached
+    # separately from full forecasts.
+    if 'current' in fields or 'hourly' in fields:
+        return FULL_FORECAST_PROFILE
+    return DAILY_ONLY_PROFILE
+
+def get_forecast_cache_key(params, profile):
+    return (profile, freeze_params(params))
+
+def get_forecast_request(lat, lon, forecast_days=7, timezone='auto', profile=FULL_FORECAST_PROFILE, forecast_hours=None):
+    params = get_weather_params(
+        quantize_coordinate(lat), quantize_coordinate(lon), 
+        forecast_days, timezone, profile, forecast_hours
+    )
+    return params, get_forecast_cache_key(params, profile)
+
+def get_forecast_expires_in(api_data):
+    return Config.FORECAST_CACHE_TTL - (time.time() - api_data.get('fetched_at', 0))
+
+def get_cached_forecast(cache_key):
+    api_data = forecast_cache.get(cache_key)
+    if api_data is not None:
+        return api_data
+    
+    # Forecasts written by other workers or the refresh scheduler keep the
+    # expiry they were fetched with when promoted into this process.
+    api_data = forecast_store.get_forecast(cache_key)
+    if api_data is not None:
+        forecast_cache.set(cache_key, api_data, ttl=get_forecast_expires_in(api_data))
+    return api_data
+
+def get_cached_forecast_expires_in(cache_key):
+    # The fresher of this process's copy and the shared store's, so a stale
+    # local entry does not trigger a refresh another worker already made.
+    expires_in = None
+    api_data = forecast_cache.peek(cache_key)
+    if api_data is not None:
+        expires_in = get_forecast_expires_in(api_data)
+    
+    expires_at = forecast_store.get_expires_at(cache_key)
+    if expires_at is not None:
+        expires_in = max(expires_in or 0, expires_at - time.time())
+    return expires_in
 
-def fetch_weather_data(lat, lon, forecast_days=7, timezone='auto'):
+def cache_forecasts(entries):
+    for cache_key, api_data in entries:
+        forecast_cache.set(cache_key, api_data)
+    
+    forecast_store.put_forecasts([
+        (cache_key, api_data, api_data['fetched_at'] + Config.FORECAST_CACHE_TTL)
+        for cache_key, api_data in entries
+    ])
+
+def fetch_weather_data(lat, lon, forecast_days=7, timezone='auto', profile=FULL_FORECAST_PROFILE, forecast_hours=None):
     url = f"{Config.WEATHER_API_URL}/forecast"
-    params = get_weather_params(lat, lon, forecast_days, timezone)
+    params, cache_key = get_forecast_request(lat, lon, forecast_days, timezone, profile, forecast_hours)
+    
+    cached_data = get_cached_forecast(cache_key)
+    if cached_data is not None:
+        return cached_data
     
-    response = requests.get(url, params=params)
+    return upstream_calls.do((url, cache_key), request_weather_data, url, params, cache_key)
+
+def request_weather_data(url, params, cache_key):
+    response = http_get(url, params=params)
     if response.status_code == 200:
-        return response.json()
+        api_data = response.json()
+        api_data['fetched_at'] = time.time()
+        cache_forecasts([(cache_key, api_data)])
+        return api_data
     else:
         raise Exception(f"Weather API returned status code {response.status_code}")
 
+def fetch_forecast_chunk(chunk_params, cache_keys, profile=FULL_FORECAST_PROFILE):
+    url = f"{Config.WEATHER_API_URL}/forecast"
+    
+    batch_params = dict(chunk_params[0])
+    batch_params['latitude'] = ','.join(str(params['latitude']) for params in chunk_params)
+    batch_params['longitude'] = ','.join(str(params['longitude']) for params in chunk_params)
+    
+    return upstream_calls.do(
+        (url, get_forecast_cache_key(batch_params, profile)),
+        request_batch_weather_data, url, batch_params, cache_keys
+    )
+
+def fetch_batch_weather_data(coordinates, forecast_days=7, timezone='auto', profile=FULL_FORECAST_PROFILE):
+    results = [None] * len(coordinates)
+    missing = {}
+    
+    for index, (lat, lon) in enumerate(coordinates):
+        try:
+            params, cache_key = get_forecast_request(lat, lon, forecast_days, timezone, profile)
+        except (TypeError, ValueError) as e:
+            results[index] = e
+            continue
+        
+        cached_data = get_cached_forecast(cache_key)
+        if cached_data is not None:
+            results[index] = cached_data
+        else:
+            missing.setdefault(cache_key, (params, []))[1].append(index)
+    
+    missing_items = list(missing.items())
+    chunk_size = Config.BATCH_FORECAST_MAX_LOCATIONS
+    
+    for start in range(0, len(missing_items), chunk_size):
+        chunk = missing_items[start:start + chunk_size]
+        chunk_params = [params for _, (params, _) in chunk]
+        
+        # Only a malformed batch payload is retried per location. HTTP and
+        # connection failures were already retried by http_get, and fanning
+        # them out would multiply load on an upstream that is failing.
+        try:
+            batch_data = fetch_forecast_chunk(chunk_params, [cache_key for cache_key, _ in chunk], profile)
+        except ForecastPayloadError as e:
+            print(f"Batch forecast failed, fetching {len(chunk)} locations individually: {e}")
+            batch_data = fetch_weather_data_concurrently(
+                [(params['latitude'], params['longitude']) for params in chunk_params],
+                forecast_days, timezone, profile
+            )
+        except Exception as e:
+            batch_data = [e] * len(chunk)
+        
+        for (_, (_, indexes)), api_data in zip(chunk, batch_data):
+            for index in indexes:
+                results[index] = api_data
+    
+    return results
+
+def fetch_weather_data_concurrently(coordinates, forecast_days=7, timezone='auto', profile=FULL_FORECAST_PROFILE):
+    def fetch_location(coordinate):
+        try:
+            return fetch_weather_data(coordinate[0], coordinate[1], forecast_days, timezone, profile)
+        except Exception as e:
+            return e
+    
+    if not coordinates:
+        return []
+    
+    max_workers = min(Config.FORECAST_FETCH_MAX_WORKERS, len(coordinates))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(fetch_location, coordinates))
+
+def request_batch_weather_data(url, params, cache_keys):
+    response = http_get(url, params=params)
+    if response.status_code != 200:
+        raise Exception(f"Weather API returned status code {response.status_code}")
+    
+    try:
+        batch_data = response.json()
+    except ValueError as e:
+        raise ForecastPayloadError(f"Weather API returned an invalid payload: {e}")
+    if isinstance(batch_data, dict):
+        batch_data = [batch_data]
+    
+    if not isinstance(batch_data, list):
+        raise ForecastPayloadError(f"Weather API returned an unexpected {type(batch_data).__name__} payload")
+    if len(batch_data) != len(cache_keys):
+        raise ForecastPayloadError(f"Weather API returned {len(batch_data)} locations, expected {len(cache_keys)}")
+    
+    fetched_at = time.time()
+    for api_data in batch_data:
+        api_data['fetched_at'] = fetched_at
+    cache_forecasts(list(zip(cache_keys, batch_data)))
+    
+    return batch_data
+
 def fetch_historical_weather_data(lat, lon, start_date, end_date, timezone='auto'):
     url = Config.HISTORICAL_WEATHER_API_URL
     params = {
@@ -42,8 +250,11 @@ def fetch_historical_weather_data(lat, lon, start_date, end_date, timezone='auto
         'timezone': timezone
     }
     
-    response = requests.get(url, params=params)
+    return upstream_calls.do((url, freeze_params(params)), request_historical_weather_data, url, params)
+
+def request_historical_weather_data(url, params):
+    response = http_get(url, params=params)
     if response.status_code == 200:
         return response.json()
     else:
-        raise Exception(f"Historical Weather API returned status code {response.status_code}")
\ No newline at end of file
+        raise Exception(f"Historical Weather API returned status code {response.status_code}")
@@ -1,104 +1,215 @@
-from datetime import datetime
+from datetime import datetime, date, timedelta, timezone
 from utils.conversions import celsius_to_fahrenheit
-from utils.weather_codes import get_weather_description, get_weather_icon
+from utils.weather_codes import (
+    get_weather_description, 
+    get_weather_icon,
+    get_weather_descriptions,
+    get_day_weather_icons
+)
 
-def build_current_weather_data(current_data):
+FORECAST_FIELDS = ('location', 'current', 'forecast', 'hourly')
+CURRENT_HOURLY_FIELDS = ('location', 'current', 'hourly')
+# Opt-in fields: only included when named in fields=.
+OPTIONAL_FORECAST_FIELDS = ('anomalies',)
+
+ALL_UNITS = ('f', 'c')
+UNIT_OPTIONS = {
+    'both': ALL_UNITS,
+    'f': ('f',),
+    'fahrenheit': ('f',),
+    'c': ('c',),
+    'celsius': ('c',)
+}
+
+def parse_units(value):
+    if not value:
+        return ALL_UNITS
+    
+    units = UNIT_OPTIONS.get(str(value).strip().lower())
+    if units is None:
+        raise ValueError(f"units must be one of: {', '.join(UNIT_OPTIONS)}")
+    return units
+
+def parse_fields(value, allowed_fields=FORECAST_FIELDS, optional_fields=()):
+    if not value:
+        return frozenset(allowed_fields)
+    
+    if isinstance(value, str):
+        value = value.split(',')
+    
+    fields = frozenset(str(field).strip().lower() for field in value if str(field).strip())
+    unknown_fields = fields.difference(allowed_fields, optional_fields)
+    if unknown_fields or not fields:
+        raise ValueError(f"fields must be a subset of: {', '.join(allowed_fields + optional_fields)}")
+    return fields
+
+def parse_coordinates(latitude, longitude):
+    if latitude in (None, '') or longitude in (None, ''):
+        raise ValueError('Latitude and longitude are required')
+    
+    try:
+        if isinstance(latitude, bool) or isinstance(longitude, bool):
+            raise TypeError
+        lat, lon = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        raise ValueError('Latitude and longitude must be numbers')
+    
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError('Latitude must be between -90 and 90 and longitude between -180 and 180')
+    return lat, lon
+
+def build_current_weather_data(current_data, units=ALL_UNITS):
     current_temp_c = current_data['temperature_2m']
-    current_temp_f = celsius_to_fahrenheit(current_temp_c)
+    feelslike_c = current_data['apparent_temperature']
+    current = {}
     
-    return {
-        'temp_f': round(current_temp_f, 1),
-        'temp_c': round(current_temp_c, 1),
-        'condition': get_weather_description(current_data['weather_code']),
-        'icon': get_weather_icon(current_data['weather_code'], 1),
-        'humidity': current_data['relative_humidity_2m'],
-        'wind_mph': round(current_data['wind_speed_10m'], 1),
-        'wind_dir': 'N',
-        'pressure_in': round(current_data.get('pressure_msl', 1013) * 0.02953, 2),
-        'feelslike_f': round(celsius_to_fahrenheit(current_data['apparent_temperature']), 1),
-        'feelslike_c': round(current_data['apparent_temperature'], 1),
-        'uv': 0,
-        'vis_miles': 10.0
-    }
+    if 'f' in units:
+        current['temp_f'] = round(celsius_to_fahrenheit(current_temp_c), 1)
+    if 'c' in units:
+        current['temp_c'] = round(current_temp_c, 1)
+    
+    current['condition'] = get_weather_description(current_data['weather_code'])
+    current['icon'] = get_weather_icon(current_data['weather_code'], 1)
+    current['humidity'] = current_data['relative_humidity_2m']
+    current['wind_mph'] = round(current_data['wind_speed_10m'], 1)
+    current['wind_dir'] = 'N'
+    current['pressure_in'] = round(current_data.get('pressure_msl', 1013) * 0.02953, 2)
+    
+    if 'f' in units:
+        current['feelslike_f'] = round(celsius_to_fahrenheit(feelslike_c), 1)
+    if 'c' in units:
+        current['feelslike_c'] = round(feelslike_c, 1)
+    
+    current['uv'] = 0
+    current['vis_miles'] = 10.0
+    return current
+
+def round_column(values, digits=None):
+    return [round(value, digits) for value in values]
+
+def fahrenheit_column(celsius_values):
+    return [round(celsius_to_fahrenheit(value), 1) for value in celsius_values]
+
+def temperature_columns(name, celsius_values, units):
+    # Only the requested unit columns are converted; a skipped unit costs nothing.
+    columns = []
+    if 'f' in units:
+        columns.append((f'{name}_f', fahrenheit_column(celsius_values)))
+    if 'c' in units:
+        columns.append((f'{name}_c', round_column(celsius_values, 1)))
+    return columns
 
-def build_hourly_weather_data(hourly_data, date_filter=None, limit=None):
-    hourly_weather = []
-    current_time = datetime.now()
-    current_hour = current_time.hour
+def build_rows(columns):
+    keys = [key for key, _ in columns]
+    return [dict(zip(keys, row)) for row in zip(*[values for _, values in columns])]
+
+def build_hourly_rows(hourly_data, start=0, stop=None, units=ALL_UNITS):
+    times = hourly_data['time'][start:stop]
+    weather_codes = hourly_data['weather_code'][start:stop]
     
-    for i, hour_time in enumerate(hourly_data['time']):
-        if date_filter:
-            hour_date = hour_time.split('T')[0]
-            if hour_date != date_filter:
-                continue
-        
-        if limit:
-            hour_dt = datetime.fromisoformat(hour_time.replace('T', ' '))
-            if hour_dt.hour < current_hour:
-                continue
-            if len(hourly_weather) >= limit:
-                break
-        
-        hour_temp_c = hourly_data['temperature_2m'][i]
-        hourly_item = {
-            'time': hour_time,
-            'temp_f': round(celsius_to_fahrenheit(hour_temp_c), 1),
-            'temp_c': round(hour_temp_c, 1),
-            'condition': get_weather_description(hourly_data['weather_code'][i]),
-            'icon': get_weather_icon(hourly_data['weather_code'][i], 1),
-            'chance_of_rain': hourly_data['precipitation_probability'][i] if hourly_data['precipitation_probability'][i] else 0,
-            'wind_mph': round(hourly_data['wind_speed_10m'][i], 1),
-            'wind_dir': 'N',
-            'humidity': hourly_data['relative_humidity_2m'][i]
-        }
-        hourly_weather.append(hourly_item)
+    columns = [('time', times)]
+    columns += temperature_columns('temp', hourly_data['temperature_2m'][start:stop], units)
+    columns += [
+        ('condition', get_weather_descriptions(weather_codes)),
+        ('icon', get_day_weather_icons(weather_codes)),
+        ('chance_of_rain', [chance if chance else 0 for chance in hourly_data['precipitation_probability'][start:stop]]),
+        ('wind_mph', round_column(hourly_data['wind_speed_10m'][start:stop], 1)),
+        ('wind_dir', ['N'] * len(times)),
+        ('humidity', hourly_data['relative_humidity_2m'][start:stop])
+    ]
     
-    return hourly_weather
+    return build_rows(columns)
 
-def build_daily_forecast_data(daily_data, hourly_data):
+def group_rows_by_date(hourly_rows):
+    rows_by_date = {}
+    for row in hourly_rows:
+        rows_by_date.setdefault(row['time'].split('T')[0], []).append(row)
+    return rows_by_date
 
-    forecast = []
+def get_current_hour_index(hour_times, utc_offset_seconds=None):
+    if not hour_times:
+        return 0
     
-    for i in range(len(daily_data['time'])):
-        date_str = daily_data['time'][i]
-        date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-        
-        hourly_for_day = build_hourly_weather_data(hourly_data, date_filter=date_str)
-        
-        day_data = {
-            'date': date_str,
-            'day_name': date_obj.strftime('%A'),
-            'max_temp_f': round(celsius_to_fahrenheit(daily_data['temperature_2m_max'][i]), 1),
-            'max_temp_c': round(daily_data['temperature_2m_max'][i], 1),
-            'min_temp_f': round(celsius_to_fahrenheit(daily_data['temperature_2m_min'][i]), 1),
-            'min_temp_c': round(daily_data['temperature_2m_min'][i], 1),
-            'condition': get_weather_description(daily_data['weather_code'][i]),
-            'icon': get_weather_icon(daily_data['weather_code'][i], 1),
-            'chance_of_rain': daily_data['precipitation_probability_max'][i] if daily_data['precipitation_probability_max'][i] else 0,
-            'humidity': round(daily_data['relative_humidity_2m_mean'][i]),
-            'wind_mph': round(daily_data['wind_speed_10m_max'][i], 1),
-            'hourly': hourly_for_day
-        }
-        forecast.append(day_data)
+    if utc_offset_seconds is None:
+        local_now = datetime.now()
+    else:
+        local_now = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=utc_offset_seconds)
+    
+    elapsed_hours = int((local_now - datetime.fromisoformat(hour_times[0])).total_seconds() // 3600)
+    return min(max(elapsed_hours, 0), len(hour_times))
+
+def build_hourly_weather_data(hourly_data, date_filter=None, limit=None, utc_offset_seconds=None, units=ALL_UNITS):
+    times = hourly_data['time']
+    start, stop = 0, len(times)
+    
+    if date_filter:
+        day_indexes = [i for i, hour_time in enumerate(times) if hour_time.split('T')[0] == date_filter]
+        if not day_indexes:
+            return []
+        start, stop = day_indexes[0], day_indexes[-1] + 1
+    
+    if limit:
+        start = max(start, get_current_hour_index(times, utc_offset_seconds))
+        stop = min(start + limit, stop)
     
-    return forecast
+    return build_hourly_rows(hourly_data, start, stop, units)
 
-def build_weather_response(api_data, location_info):
+def build_daily_forecast_data(daily_data, hourly_data, units=ALL_UNITS, include_hourly=True, anomalies=None):
 
-    current_data = build_current_weather_data(api_data['current'])
-    forecast_data = build_daily_forecast_data(api_data['daily'], api_data['hourly'])
+    daily_times = daily_data['time']
+    weather_codes = daily_data['weather_code']
     
+    columns = [
+        ('date', daily_times),
+        ('day_name', [date.fromisoformat(date_str).strftime('%A') for date_str in daily_times])
+    ]
+    columns += temperature_columns('max_temp', daily_data['temperature_2m_max'], units)
+    columns += temperature_columns('min_temp', daily_data['temperature_2m_min'], units)
+    columns += [
+        ('condition', get_weather_descriptions(weather_codes)),
+        ('icon', get_day_weather_icons(weather_codes)),
+        ('chance_of_rain', [chance if chance else 0 for chance in daily_data['precipitation_probability_max']]),
+        ('humidity', round_column(daily_data['relative_humidity_2m_mean'])),
+        ('wind_mph', round_column(daily_data['wind_speed_10m_max'], 1))
+    ]
+    
+    if include_hourly:
+        hourly_by_date = group_rows_by_date(build_hourly_rows(hourly_data, units=units))
+        columns.append(('hourly', [hourly_by_date.get(date_str, []) for date_str in daily_times]))
+    
+    if anomalies is not None:
+        columns.append(('anomaly', anomalies))
+    
+    return build_rows(columns)
+
+def get_localtime(api_data):
+    fetched_at = api_data.get('fetched_at')
+    updated_at = datetime.fromtimestamp(fetched_at) if fetched_at is not None else datetime.now()
+    return updated_at.strftime('%Y-%m-%d %H:%M')
+
+def build_location_data(location_info, api_data):
     return {
-        'location': {
-            'name': location_info['name'],
-            'region': location_info['region'],
-            'country': location_info['country'],
-            'localtime': datetime.now().strftime('%Y-%m-%d %H:%M')
-        },
-        'current': current_data,
-        'forecast': forecast_data
+        'name': location_info['name'],
+        'region': location_info['region'],
+        'country': location_info['country'],
+        'localtime': get_localtime(api_data)
     }
 
+def build_weather_response(api_data, location_info, units=ALL_UNITS, fields=FORECAST_FIELDS, anomalies=None):
+    weather_response = {}
+    
+    if 'location' in fields:
+        weather_response['location'] = build_location_data(location_info, api_data)
+    if 'current' in fields:
+        weather_response['current'] = build_current_weather_data(api_data['current'], units)
+    if 'forecast' in fields:
+        weather_response['forecast'] = build_daily_forecast_data(
+            api_data['daily'], api_data.get('hourly'), units, 
+            include_hourly='hourly' in fields, anomalies=anomalies
+        )
+    
+    return weather_response
+
 def format_historical_weather_response(weather_records, location_info):
 
     formatted_data = []
@@ -135,4 +246,44 @@ def format_historical_weather_response(weather_records, location_info):
             'end_date': weather_records[-1]['weather_date'] if weather_records else None,
             'total_days': len(formatted_data)  
         }
-    }
\ No newline at end of file
+    }
+
+def format_climate_aggregates(aggregate_rows, location_info, period_type):
+
+    periods = []
+    
+    for row in aggregate_rows:
+        condition_counts = sorted(row['condition_counts'].items(), key=lambda item: item[1], reverse=True)
+        
+        periods.append({
+            'period': row['period'],
+            'days': row['day_count'],
+            'mean_max_temp_f': round(celsius_to_fahrenheit(row['temperature_max_mean']), 1),
+            'mean_max_temp_c': round(row['temperature_max_mean'], 1),
+            'mean_min_temp_f': round(celsius_to_fahrenheit(row['temperature_min_mean']), 1),
+            'mean_min_temp_c': round(row['temperature_min_mean'], 1),
+            'precipitation_total': round(row['precipitation_total'], 2),
+            'wettest_day': {
+                'date': row['wettest_date'],
+                'precipitation': round(row['wettest_precipitation'], 2)
+            },
+            'hottest_day': {
+                'date': row['hottest_date'],
+                'max_temp_f': round(celsius_to_fahrenheit(row['hottest_temperature']), 1),
+                'max_temp_c': round(row['hottest_temperature'], 1)
+            },
+            'conditions': [
+                {
+                    'code': int(code),
+                    'condition': get_weather_description(int(code)),
+                    'days': days
+                }
+                for code, days in condition_counts
+            ]
+        })
+    
+    return {
+        'location': location_info,
+        'period_type': period_type,
+        'periods': periods
+    }
@@ -114,6 +114,7 @@ class AuthManager {
             console.log('Login response:', result);
 
             if (result.status === 'success') {
+                window.apiService.setAuthToken(result.token);
                 this.setCurrentUser(email, result.user_id);
                 this.hideLoginModal();
                 await this.loadUserData();
@@ -138,6 +139,7 @@ class AuthManager {
         console.log('Logging out user:', this.currentUser);
         this.currentUser = null;
         this.userId = null;
+        window.apiService.setAuthToken(null);
 
         // Reset weather history mode before resetting other components
         if (window.weatherHistory && window.weatherHistory.isHistoryMode) {
@@ -1,4 +1,18 @@
 class APIService {
+    constructor() {
+        this.authToken = null;
+    }
+
+    setAuthToken(token) {
+        this.authToken = token || null;
+    }
+
+    authHeaders(headers = {}) {
+        if (this.authToken) {
+            return { ...headers, 'Authorization': `Bearer ${this.authToken}` };
+        }
+        return headers;
+    }
 
     async getNYCForecast() {
         try {
@@ -85,9 +99,9 @@ class APIService {
 
             const response = await fetch('/save-location', {
                 method: 'POST',
-                headers: {
+                headers: this.authHeaders({
                     'Content-Type': 'application/json',
-                },
+                }),
                 body: JSON.stringify(requestBody)
             });
             return await response.json();
@@ -101,9 +115,9 @@ class APIService {
         try {
             const response = await fetch('/remove-location', {
                 method: 'POST',
-                headers: {
+                headers: this.authHeaders({
                     'Content-Type': 'application/json',
-                },
+                }),
                 body: JSON.stringify({
                     email: email,
                     location_id: userLocationId  // This is now user_location_id
@@ -118,7 +132,9 @@ class APIService {
 
     async getUserLocations(email) {
         try {
-            const response = await fetch(`/get-locations/${email}`);
+            const response = await fetch(`/get-locations/${email}`, {
+                headers: this.authHeaders()
+            });
             return await response.json();
         } catch (error) {
             console.error('Error fetching user locations:', error);
@@ -151,9 +167,9 @@ class APIService {
         try {
             const response = await fetch('/weather/history', {
                 method: 'POST',
-                headers: {
+                headers: this.authHeaders({
                     'Content-Type': 'application/json',
-                },
+                }),
                 body: JSON.stringify({
                     email: email,
                     user_location_id: userLocationId,
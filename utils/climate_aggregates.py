@@ -0,0 +1,209 @@
+import argparse
+import calendar
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+from config import Config
+from utils import db
+
+MONTH_PERIOD = 'month'
+YEAR_PERIOD = 'year'
+PERIOD_TYPES = (MONTH_PERIOD, YEAR_PERIOD)
+
+# A single worker keeps updates for the same month or year from racing each
+# other; queued updates still run before the interpreter exits.
+_updater = ThreadPoolExecutor(max_workers=1, thread_name_prefix='climate-aggregates')
+
+def summarize_weather_records(weather_records):
+    summary = {
+        'day_count': 0,
+        'temperature_max_sum': 0.0,
+        'temperature_min_sum': 0.0,
+        'precipitation_total': 0.0,
+        'wettest_date': None,
+        'wettest_precipitation': None,
+        'hottest_date': None,
+        'hottest_temperature': None,
+        'condition_counts': {}
+    }
+
+    for record in weather_records:
+        temp_max = record['temperature_max']
+        temp_min = record['temperature_min']
+        if temp_max is None or temp_min is None:
+            continue
+
+        temp_max = float(temp_max)
+        precipitation = float(record['precipitation'] or 0.0)
+
+        summary['day_count'] += 1
+        summary['temperature_max_sum'] += temp_max
+        summary['temperature_min_sum'] += float(temp_min)
+        summary['precipitation_total'] += precipitation
+
+        if summary['wettest_precipitation'] is None or precipitation > summary['wettest_precipitation']:
+            summary['wettest_date'] = record['weather_date']
+            summary['wettest_precipitation'] = precipitation
+        if summary['hottest_temperature'] is None or temp_max > summary['hottest_temperature']:
+            summary['hottest_date'] = record['weather_date']
+            summary['hottest_temperature'] = temp_max
+
+        condition = str(record['weather_condition'])
+        summary['condition_counts'][condition] = summary['condition_counts'].get(condition, 0) + 1
+
+    return summary
+
+def combine_summaries(summaries):
+    combined = summarize_weather_records([])
+
+    for summary in summaries:
+        if not summary['day_count']:
+            continue
+
+        combined['day_count'] += summary['day_count']
+        combined['temperature_max_sum'] += summary['temperature_max_sum']
+        combined['temperature_min_sum'] += summary['temperature_min_sum']
+        combined['precipitation_total'] += summary['precipitation_total']
+
+        if combined['wettest_precipitation'] is None or summary['wettest_precipitation'] > combined['wettest_precipitation']:
+            combined['wettest_date'] = summary['wettest_date']
+            combined['wettest_precipitation'] = summary['wettest_precipitation']
+        if combined['hottest_temperature'] is None or summary['hottest_temperature'] > combined['hottest_temperature']:
+            combined['hottest_date'] = summary['hottest_date']
+            combined['hottest_temperature'] = summary['hottest_temperature']
+
+        for condition, count in summary['condition_counts'].items():
+            combined['condition_counts'][condition] = combined['condition_counts'].get(condition, 0) + count
+
+    return combined
+
+def build_aggregate_row(location_id, period_type, period, summary):
+    day_count = summary['day_count']
+    return {
+        'location_id': location_id,
+        'period_type': period_type,
+        'period': period,
+        **summary,
+        'temperature_max_mean': round(summary['temperature_max_sum'] / day_count, 2),
+        'temperature_min_mean': round(summary['temperature_min_sum'] / day_count, 2),
+        'updated_at': datetime.now(timezone.utc).isoformat()
+    }
+
+def get_month_bounds(month):
+    year, month_number = int(month[:4]), int(month[5:7])
+    last_day = calendar.monthrange(year, month_number)[1]
+    return date(year, month_number, 1), date(year, month_number, last_day)
+
+def get_month_weather_records(location_id, month):
+    month_start, month_end = get_month_bounds(month)
+    return (db.table('location_history')
+            .select('weather_date, temperature_max, temperature_min, precipitation, weather_condition')
+            .eq('location_id', location_id)
+            .gte('weather_date', month_start.strftime('%Y-%m-%d'))
+            .lte('weather_date', month_end.strftime('%Y-%m-%d'))
+            .execute()
+            .data)
+
+def get_climate_aggregates(location_id, period_type=MONTH_PERIOD, start_period=None, end_period=None):
+    query = (db.table('location_history_aggregates')
+             .select('*')
+             .eq('location_id', location_id)
+             .eq('period_type', period_type))
+
+    if start_period:
+        query = query.gte('period', start_period)
+    if end_period:
+        query = query.lte('period', end_period)
+
+    return query.order('period').execute().data
+
+def update_climate_aggregates(location_id, weather_records):
+    # Only the months touched by this write are re-reduced (at most 31 days
+    # each), and each affected year is rebuilt from its twelve month rows.
+    records_by_month = {}
+    for record in weather_records:
+        records_by_month.setdefault(record['weather_date'][:7], []).append(record)
+
+    if not records_by_month:
+        return []
+
+    month_rows = []
+    for month, month_records in sorted(records_by_month.items()):
+        month_start, month_end = get_month_bounds(month)
+        if len({record['weather_date'] for record in month_records}) < (month_end - month_start).days + 1:
+            month_records = get_month_weather_records(location_id, month)
+
+        summary = summarize_weather_records(month_records)
+        if summary['day_count']:
+            month_rows.append(build_aggregate_row(location_id, MONTH_PERIOD, month, summary))
+
+    upsert_aggregate_rows(month_rows)
+
+    year_rows = []
+    for year in sorted({month[:4] for month in records_by_month}):
+        year_months = get_climate_aggregates(location_id, MONTH_PERIOD, f'{year}-01', f'{year}-12')
+        summary = combine_summaries(year_months)
+        if summary['day_count']:
+            year_rows.append(build_aggregate_row(location_id, YEAR_PERIOD, year, summary))
+
+    upsert_aggregate_rows(year_rows)
+    return month_rows + year_rows
+
+def run_climate_aggregates_update(location_id, weather_records):
+    try:
+        return update_climate_aggregates(location_id, weather_records)
+    except Exception as e:
+        print(f"Error updating climate aggregates for location {location_id}: {e}")
+        return []
+
+def schedule_climate_aggregates_update(location_id, weather_records):
+    # Keeps the month and year reads and upserts off the request that wrote
+    # the history rows.
+    if not weather_records:
+        return None
+    return _updater.submit(run_climate_aggregates_update, location_id, weather_records)
+
+def upsert_aggregate_rows(aggregate_rows):
+    if not aggregate_rows:
+        return []
+
+    return (db.table('location_history_aggregates')
+            .upsert(aggregate_rows, on_conflict='location_id,period_type,period')
+            .execute()
+            .data)
+
+def rebuild_climate_aggregates(location_id, page_size=None):
+    # For history stored before aggregates existed; new writes are picked up
+    # by store_weather_history.
+    page_size = page_size or Config.WEATHER_HISTORY_PAGE_SIZE
+    last_date = None
+    rebuilt_rows = 0
+
+    while True:
+        query = (db.table('location_history')
+                 .select('weather_date, temperature_max, temperature_min, precipitation, weather_condition')
+                 .eq('location_id', location_id))
+        if last_date is not None:
+            query = query.gt('weather_date', last_date)
+
+        page = query.order('weather_date').limit(page_size).execute().data
+        rebuilt_rows += len(update_climate_aggregates(location_id, page))
+
+        if len(page) < page_size:
+            return rebuilt_rows
+        last_date = page[-1]['weather_date']
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild monthly and annual climate aggregates from location_history.')
+    parser.add_argument('--location-id', action='append', dest='location_ids', help='only rebuild this location (repeatable)')
+    args = parser.parse_args()
+
+    query = db.table('locations').select('id, name')
+    if args.location_ids:
+        query = query.in_('id', args.location_ids)
+
+    for location in query.order('id').execute().data:
+        rebuilt_rows = rebuild_climate_aggregates(location['id'])
+        print(f"{location['name']}: rebuilt {rebuilt_rows} aggregate rows")
+
+if __name__ == '__main__':
+    main()
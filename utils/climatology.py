@@ -0,0 +1,230 @@
+import math
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor, wait
+from config import Config
+from services.cache import TTLCache
+from utils import db
+from utils.conversions import celsius_to_fahrenheit
+from utils.location import get_location_grid_key, location_id_cache, find_location_id_by_grid_key
+
+# Day-of-year on a 365-day calendar; Feb 29 is folded onto Feb 28.
+MONTH_OFFSETS = (0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334)
+DAYS_PER_YEAR = 365
+
+climatology_cache = TTLCache(Config.CLIMATOLOGY_CACHE_MAX_ENTRIES, Config.CLIMATOLOGY_CACHE_TTL)
+
+_loader = ThreadPoolExecutor(max_workers=Config.CLIMATOLOGY_LOAD_WORKERS, thread_name_prefix='climatology')
+_pending_loads = {}
+_pending_lock = threading.Lock()
+
+def get_day_of_year(date_str):
+    month = int(date_str[5:7])
+    day = int(date_str[8:10])
+    return MONTH_OFFSETS[month - 1] + min(day, 28 if month == 2 else day) - 1
+
+def get_percentile(sorted_values, percentile):
+    position = (len(sorted_values) - 1) * percentile / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+class Climatology:
+    def __init__(self, days_of_year, temperatures_max, temperatures_min, window_days=7, min_samples=10):
+        self.window_days = window_days
+        self.min_samples = min_samples
+        self.sample_count = len(days_of_year)
+        self.loaded_at = time.time()
+        self._normals = {}
+        self._lock = threading.Lock()
+
+        # Columns are stored ordered by day of year with an offsets index
+        # (offsets[d]:offsets[d + 1] holds day d), so a window is one or two
+        # contiguous array slices.
+        order = sorted(range(self.sample_count), key=days_of_year.__getitem__)
+        self.max_values = array('d', [temperatures_max[i] for i in order])
+        self.min_values = array('d', [temperatures_min[i] for i in order])
+
+        counts = [0] * DAYS_PER_YEAR
+        for day_of_year in days_of_year:
+            counts[day_of_year] += 1
+        self.offsets = array('I', [0])
+        for count in counts:
+            self.offsets.append(self.offsets[-1] + count)
+
+    def __bool__(self):
+        return self.sample_count > 0
+
+    def get_window(self, values, day_of_year):
+        first_day = day_of_year - self.window_days
+        last_day = day_of_year + self.window_days
+
+        if first_day < 0:
+            return values[self.offsets[DAYS_PER_YEAR + first_day]:] + values[:self.offsets[last_day + 1]]
+        if last_day >= DAYS_PER_YEAR:
+            return values[self.offsets[first_day]:] + values[:self.offsets[last_day - DAYS_PER_YEAR + 1]]
+        return values[self.offsets[first_day]:self.offsets[last_day + 1]]
+
+    def get_normals(self, day_of_year):
+        # At most 365 distinct windows per location, each reduced once.
+        normals = self._normals.get(day_of_year)
+        if normals is not None or day_of_year in self._normals:
+            return normals
+
+        max_window = self.get_window(self.max_values, day_of_year)
+        min_window = self.get_window(self.min_values, day_of_year)
+        normals = None
+
+        if len(max_window) >= self.min_samples:
+            sorted_max = sorted(max_window)
+            sorted_min = sorted(min_window)
+            normals = {
+                'samples': len(max_window),
+                'max_mean': math.fsum(max_window) / len(max_window),
+                'max_p10': get_percentile(sorted_max, 10),
+                'max_p90': get_percentile(sorted_max, 90),
+                'min_mean': math.fsum(min_window) / len(min_window),
+                'min_p10': get_percentile(sorted_min, 10),
+                'min_p90': get_percentile(sorted_min, 90)
+            }
+
+        with self._lock:
+            self._normals[day_of_year] = normals
+        return normals
+
+def load_history_arrays(location_id):
+    page_size = Config.WEATHER_HISTORY_PAGE_SIZE
+    days_of_year = array('H')
+    temperatures_max = array('d')
+    temperatures_min = array('d')
+    last_date = None
+
+    while True:
+        query = (db.table('location_history')
+                 .select('weather_date, temperature_max, temperature_min')
+                 .eq('location_id', location_id))
+        if last_date is not None:
+            query = query.gt('weather_date', last_date)
+
+        page = query.order('weather_date').limit(page_size).execute().data
+        for record in page:
+            if record['temperature_max'] is None or record['temperature_min'] is None:
+                continue
+            days_of_year.append(get_day_of_year(record['weather_date']))
+            temperatures_max.append(float(record['temperature_max']))
+            temperatures_min.append(float(record['temperature_min']))
+
+        if len(page) < page_size:
+            return days_of_year, temperatures_max, temperatures_min
+        last_date = page[-1]['weather_date']
+
+def load_climatology(grid_key):
+    location_id = location_id_cache.get(grid_key)
+    if location_id is None:
+        location_id = find_location_id_by_grid_key(grid_key)
+
+    if location_id is None:
+        history_arrays = (array('H'), array('d'), array('d'))
+    else:
+        history_arrays = load_history_arrays(location_id)
+
+    # Locations without history are cached too, so they are not reloaded on
+    # every forecast request.
+    climatology = Climatology(
+        *history_arrays,
+        window_days=Config.CLIMATOLOGY_WINDOW_DAYS,
+        min_samples=Config.CLIMATOLOGY_MIN_SAMPLES
+    )
+    climatology_cache.set(grid_key, climatology)
+    return climatology
+
+def schedule_climatology_load(grid_key):
+    with _pending_lock:
+        future = _pending_loads.get(grid_key)
+        if future is not None:
+            return future
+        future = _loader.submit(load_climatology, grid_key)
+        _pending_loads[grid_key] = future
+    
+    # Registered outside the lock: a load that has already finished runs the
+    # callback in this thread, and the callback takes _pending_lock itself.
+    future.add_done_callback(lambda _: finish_climatology_load(grid_key, future))
+    return future
+
+def finish_climatology_load(grid_key, future):
+    with _pending_lock:
+        if _pending_loads.get(grid_key) is future:
+            del _pending_loads[grid_key]
+
+def get_climatologies(coordinates, max_wait=None):
+    # The forecast path never loads history itself: cache misses are handed to
+    # the loader pool and the request waits at most max_wait seconds in total.
+    max_wait = Config.CLIMATOLOGY_MAX_WAIT_MS / 1000 if max_wait is None else max_wait
+    grid_keys = [get_location_grid_key(lat, lon) for lat, lon in coordinates]
+    climatologies = {}
+    pending = {}
+
+    for grid_key in grid_keys:
+        if grid_key in climatologies or grid_key in pending:
+            continue
+
+        climatology = climatology_cache.get(grid_key)
+        if climatology is not None:
+            climatologies[grid_key] = climatology
+        else:
+            pending[grid_key] = schedule_climatology_load(grid_key)
+
+    if pending and max_wait > 0:
+        wait(pending.values(), timeout=max_wait)
+        for grid_key, future in pending.items():
+            if future.done() and future.exception() is None:
+                climatologies[grid_key] = future.result()
+
+    return [climatologies.get(grid_key) or None for grid_key in grid_keys]
+
+def get_climatology(lat, lon, max_wait=None):
+    return get_climatologies([(lat, lon)], max_wait)[0]
+
+def get_climatology_version(climatology):
+    return climatology.loaded_at if climatology else None
+
+def build_temperature_values(name, celsius_value, units, delta=False):
+    values = {}
+    if 'f' in units:
+        values[f'{name}_f'] = round(celsius_value * 9 / 5 if delta else celsius_to_fahrenheit(celsius_value), 1)
+    if 'c' in units:
+        values[f'{name}_c'] = round(celsius_value, 1)
+    return values
+
+def get_anomaly_category(value, low, high):
+    if value > high:
+        return 'above_normal'
+    if value < low:
+        return 'below_normal'
+    return 'near_normal'
+
+def build_anomaly_column(climatology, daily_data, units=('f', 'c')):
+    if not climatology:
+        return None
+
+    anomalies = []
+    for date_str, temp_max, temp_min in zip(
+        daily_data['time'], daily_data['temperature_2m_max'], daily_data['temperature_2m_min']
+    ):
+        normals = climatology.get_normals(get_day_of_year(date_str))
+        if normals is None or temp_max is None or temp_min is None:
+            anomalies.append(None)
+            continue
+
+        anomaly = {}
+        anomaly.update(build_temperature_values('max_temp', temp_max - normals['max_mean'], units, delta=True))
+        anomaly.update(build_temperature_values('min_temp', temp_min - normals['min_mean'], units, delta=True))
+        anomaly.update(build_temperature_values('normal_max_temp', normals['max_mean'], units))
+        anomaly.update(build_temperature_values('normal_min_temp', normals['min_mean'], units))
+        anomaly['max_temp_category'] = get_anomaly_category(temp_max, normals['max_p10'], normals['max_p90'])
+        anomaly['min_temp_category'] = get_anomaly_category(temp_min, normals['min_p10'], normals['min_p90'])
+        anomaly['samples'] = normals['samples']
+        anomalies.append(anomaly)
+
+    return anomalies
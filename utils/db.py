@@ -0,0 +1,295 @@
+import copy
+import threading
+import time
+from datetime import datetime, timezone
+from config import Config
+from services.metrics import observe_database_request
+
+TABLE_UNIQUE_KEYS = {
+    'users': [('email',)],
+    'locations': [('grid_key',)],
+    'user_locations': [('user_id', 'location_id')],
+    'location_history': [('location_id', 'weather_date')],
+    'location_history_aggregates': [('location_id', 'period_type', 'period')]
+}
+
+TABLE_DEFAULTS = {
+    'users': {'created_at': None},
+    'locations': {'created_at': None},
+    'user_locations': {'custom_name': None, 'added_at': None},
+    'location_history': {'created_at': None},
+    'location_history_aggregates': {}
+}
+
+FOREIGN_KEYS = {
+    ('user_locations', 'users'): 'user_id',
+    ('user_locations', 'locations'): 'location_id',
+    ('location_history', 'locations'): 'location_id',
+    ('location_history_aggregates', 'locations'): 'location_id'
+}
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = create_backend(Config.DATABASE_BACKEND)
+    return _client
+
+def set_client(client):
+    global _client
+    with _client_lock:
+        _client = client
+
+def create_backend(backend):
+    if backend == 'memory':
+        return InMemoryClient()
+    
+    from supabase import create_client
+    return create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY)
+
+QUERY_OPERATIONS = ('select', 'insert', 'upsert', 'update', 'delete')
+
+# SQLSTATE classes 22 (data exception) and 23 (integrity constraint violation)
+# are caused by the rows written; network, auth and server errors are not, and
+# would fail the same way for any subset of them.
+ROW_ERROR_SQLSTATE_CLASSES = ('22', '23')
+
+def table(name):
+    return InstrumentedQuery(get_client().table(name), name)
+
+def is_row_error(error):
+    code = getattr(error, 'code', None)
+    return isinstance(code, str) and code[:2] in ROW_ERROR_SQLSTATE_CLASSES
+
+
+class InstrumentedQuery:
+    # Wraps a supabase or in-memory query builder so every execute() is
+    # recorded per table and operation, whichever backend is configured.
+    def __init__(self, query, name, operation='select'):
+        self.query = query
+        self.name = name
+        self.operation = operation
+
+    def __getattr__(self, attribute):
+        value = getattr(self.query, attribute)
+        if not callable(value):
+            return value
+
+        operation = attribute if attribute in QUERY_OPERATIONS else self.operation
+
+        def call(*args, **kwargs):
+            result = value(*args, **kwargs)
+            if hasattr(result, 'execute'):
+                return InstrumentedQuery(result, self.name, operation)
+            return result
+        return call
+
+    def execute(self):
+        started_at = time.perf_counter()
+        try:
+            response = self.query.execute()
+        except Exception:
+            observe_database_request(self.name, self.operation, 'error', time.perf_counter() - started_at)
+            raise
+        observe_database_request(self.name, self.operation, 'ok', time.perf_counter() - started_at)
+        return response
+
+
+class InMemoryError(Exception):
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+class InMemoryResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class InMemoryClient:
+    def __init__(self):
+        self.tables = {name: [] for name in TABLE_UNIQUE_KEYS}
+        self.next_ids = {name: 1 for name in TABLE_UNIQUE_KEYS}
+        self.lock = threading.RLock()
+
+    def table(self, name):
+        return InMemoryQuery(self, name)
+
+    def insert_rows(self, name, rows, on_conflict=None, ignore_duplicates=False):
+        with self.lock:
+            table_rows = self.tables.setdefault(name, [])
+            conflict_columns = tuple(on_conflict.split(',')) if on_conflict else None
+            inserted = []
+
+            for row in rows:
+                existing = self.find_conflict(name, row, conflict_columns)
+                if existing is not None:
+                    if ignore_duplicates:
+                        continue
+                    if conflict_columns is None:
+                        raise InMemoryError(f'duplicate key value violates unique constraint "{name}_key"', '23505')
+                    existing.update(copy.deepcopy(row))
+                    inserted.append(copy.deepcopy(existing))
+                    continue
+
+                new_row = {'id': self.next_ids.get(name, 1)}
+                self.next_ids[name] = new_row['id'] + 1
+                for column, default in TABLE_DEFAULTS.get(name, {}).items():
+                    new_row[column] = default
+                if 'added_at' in new_row:
+                    new_row['added_at'] = datetime.now(timezone.utc).isoformat()
+                if 'created_at' in new_row:
+                    new_row['created_at'] = datetime.now(timezone.utc).isoformat()
+                new_row.update(copy.deepcopy(row))
+
+                table_rows.append(new_row)
+                inserted.append(copy.deepcopy(new_row))
+
+            return inserted
+
+    def find_conflict(self, name, row, conflict_columns):
+        unique_keys = [conflict_columns] if conflict_columns else TABLE_UNIQUE_KEYS.get(name, [])
+        for existing in self.tables.get(name, []):
+            if 'id' in row and existing['id'] == row['id']:
+                return existing
+            for columns in unique_keys:
+                if all(column in row for column in columns) and all(
+                    existing.get(column) == row[column] for column in columns
+                ):
+                    return existing
+        return None
+
+
+def split_columns(columns):
+    parts = []
+    depth = 0
+    current = ''
+    for char in columns:
+        if char == ',' and depth == 0:
+            parts.append(current.strip())
+            current = ''
+            continue
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+class InMemoryQuery:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.action = 'select'
+        self.columns = '*'
+        self.payload = None
+        self.on_conflict = None
+        self.ignore_duplicates = False
+        self.filters = []
+        self.orders = []
+        self.row_limit = None
+
+    def select(self, columns='*', **kwargs):
+        self.action = 'select'
+        self.columns = columns
+        return self
+
+    def insert(self, payload, **kwargs):
+        self.action = 'insert'
+        self.payload = payload
+        return self
+
+    def upsert(self, payload, on_conflict=None, ignore_duplicates=False, **kwargs):
+        self.action = 'upsert'
+        self.payload = payload
+        self.on_conflict = on_conflict
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def delete(self, **kwargs):
+        self.action = 'delete'
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: str(row.get(column)) == str(value))
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] > value)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] >= value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] < value)
+        return self
+
+    def lte(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] <= value)
+        return self
+
+    def in_(self, column, values):
+        allowed = {str(value) for value in values}
+        self.filters.append(lambda row: str(row.get(column)) in allowed)
+        return self
+
+    def order(self, column, desc=False, **kwargs):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, count, **kwargs):
+        self.row_limit = count
+        return self
+
+    def execute(self):
+        with self.client.lock:
+            if self.action in ('insert', 'upsert'):
+                rows = self.payload if isinstance(self.payload, list) else [self.payload]
+                on_conflict = self.on_conflict
+                if self.action == 'upsert' and not on_conflict:
+                    on_conflict = 'id'
+                return InMemoryResponse(
+                    self.client.insert_rows(self.name, rows, on_conflict, self.ignore_duplicates)
+                )
+
+            matches = [row for row in self.client.tables.get(self.name, []) if all(f(row) for f in self.filters)]
+
+            if self.action == 'delete':
+                self.client.tables[self.name] = [
+                    row for row in self.client.tables[self.name] if not any(row is match for match in matches)
+                ]
+                return InMemoryResponse(copy.deepcopy(matches))
+
+            for column, desc in reversed(self.orders):
+                matches.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+            if self.row_limit is not None:
+                matches = matches[:self.row_limit]
+
+            return InMemoryResponse([self.project(row) for row in matches])
+
+    def project(self, row):
+        result = {}
+        for column in split_columns(self.columns):
+            if '(' not in column:
+                if column == '*':
+                    result.update(copy.deepcopy(row))
+                else:
+                    result[column] = copy.deepcopy(row.get(column))
+                continue
+
+            related_name, related_columns = column[:-1].split('(', 1)
+            foreign_key = FOREIGN_KEYS[(self.name, related_name)]
+            related_rows = InMemoryQuery(self.client, related_name).select(related_columns)
+            related_rows.filters.append(lambda related: related['id'] == row.get(foreign_key))
+            related_data = related_rows.execute().data
+            result[related_name] = related_data[0] if related_data else None
+        return result
@@ -0,0 +1,130 @@
+import json
+import sqlite3
+import threading
+import time
+from config import Config
+
+_local = threading.local()
+
+def get_connection():
+    connection = getattr(_local, 'connection', None)
+    if connection is None:
+        connection = sqlite3.connect(Config.FORECAST_STORE_PATH, timeout=5)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS forecast_cache ('
+            'cache_key TEXT PRIMARY KEY, '
+            'expires_at REAL NOT NULL, '
+            'payload TEXT NOT NULL'
+            ') WITHOUT ROWID'
+        )
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS leases ('
+            'name TEXT PRIMARY KEY, '
+            'owner TEXT NOT NULL, '
+            'expires_at REAL NOT NULL'
+            ') WITHOUT ROWID'
+        )
+        _local.connection = connection
+    return connection
+
+def is_enabled():
+    return bool(Config.FORECAST_STORE_PATH)
+
+def encode_key(cache_key):
+    return json.dumps(cache_key, separators=(',', ':'))
+
+def get_forecast(cache_key):
+    if not is_enabled():
+        return None
+    
+    try:
+        row = get_connection().execute(
+            'SELECT payload FROM forecast_cache WHERE cache_key = ? AND expires_at > ?',
+            (encode_key(cache_key), time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+    except sqlite3.Error as e:
+        print(f"Error reading shared forecast cache: {e}")
+        return None
+
+def get_expires_at(cache_key):
+    if not is_enabled():
+        return None
+    
+    try:
+        row = get_connection().execute(
+            'SELECT expires_at FROM forecast_cache WHERE cache_key = ? AND expires_at > ?',
+            (encode_key(cache_key), time.time())
+        ).fetchone()
+        return row[0] if row else None
+    except sqlite3.Error as e:
+        print(f"Error reading shared forecast cache: {e}")
+        return None
+
+def put_forecasts(entries):
+    if not is_enabled() or not entries:
+        return
+    
+    rows = [
+        (encode_key(cache_key), expires_at, json.dumps(api_data))
+        for cache_key, api_data, expires_at in entries
+    ]
+    
+    try:
+        connection = get_connection()
+        with connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO forecast_cache (cache_key, expires_at, payload) VALUES (?, ?, ?)',
+                rows
+            )
+    except sqlite3.Error as e:
+        print(f"Error writing shared forecast cache: {e}")
+
+def purge_expired():
+    if not is_enabled():
+        return 0
+    
+    try:
+        connection = get_connection()
+        with connection:
+            return connection.execute(
+                'DELETE FROM forecast_cache WHERE expires_at <= ?', (time.time(),)
+            ).rowcount
+    except sqlite3.Error as e:
+        print(f"Error purging shared forecast cache: {e}")
+        return 0
+
+def acquire_lease(name, owner, lease_seconds):
+    # Lets one process on the host own a periodic job: the owner renews the
+    # lease each run, and any other process may take it over once it lapses.
+    if not is_enabled():
+        return True
+    
+    now = time.time()
+    try:
+        connection = get_connection()
+        with connection:
+            connection.execute(
+                'INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) '
+                'ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at '
+                'WHERE leases.owner = excluded.owner OR leases.expires_at <= ?',
+                (name, owner, now + lease_seconds, now)
+            )
+            row = connection.execute('SELECT owner FROM leases WHERE name = ?', (name,)).fetchone()
+        return row is not None and row[0] == owner
+    except sqlite3.Error as e:
+        print(f"Error acquiring {name} lease: {e}")
+        return False
+
+def release_lease(name, owner):
+    if not is_enabled():
+        return
+    
+    try:
+        connection = get_connection()
+        with connection:
+            connection.execute('DELETE FROM leases WHERE name = ? AND owner = ?', (name, owner))
+    except sqlite3.Error as e:
+        print(f"Error releasing {name} lease: {e}")
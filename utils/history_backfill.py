@@ -0,0 +1,182 @@
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import date, timedelta
+from config import Config
+from utils import db
+from utils.weather_history import (
+    build_weather_history_records,
+    get_weather_history_from_db,
+    find_missing_date_ranges,
+    split_date_range,
+    store_weather_history
+)
+from services.weather_api import fetch_historical_weather_data
+
+class RateLimiter:
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next_at = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_at - now
+            self._next_at = max(now, self._next_at) + self.interval
+
+        if delay > 0:
+            time.sleep(delay)
+
+def get_backfill_locations(location_ids=None):
+    page_size = Config.WEATHER_HISTORY_PAGE_SIZE
+    locations = []
+    last_id = None
+
+    while True:
+        query = db.table('locations').select('id, name, latitude, longitude')
+        if location_ids:
+            query = query.in_('id', list(location_ids))
+        if last_id is not None:
+            query = query.gt('id', last_id)
+
+        page = query.order('id').limit(page_size).execute().data
+        locations.extend(page)
+
+        if len(page) < page_size:
+            return locations
+        last_id = page[-1]['id']
+
+def load_progress(progress_path, start_date, end_date):
+    span = {'start_date': start_date.isoformat(), 'end_date': end_date.isoformat()}
+
+    if progress_path and os.path.exists(progress_path):
+        with open(progress_path) as progress_file:
+            progress = json.load(progress_file)
+
+        if {key: progress.get(key) for key in span} == span:
+            return progress
+        print(f"Ignoring progress in {progress_path}: it was recorded for a different date span")
+
+    return {**span, 'completed_through': {}}
+
+def save_progress(progress_path, progress):
+    if not progress_path:
+        return
+
+    temporary_path = f"{progress_path}.tmp"
+    with open(temporary_path, 'w') as progress_file:
+        json.dump(progress, progress_file, indent=2, sort_keys=True)
+    os.replace(temporary_path, progress_path)
+
+def get_stored_through(chunk_start, chunk_end, valid_dates, stored_dates):
+    # Days the archive had no usable data for cannot be stored and do not
+    # hold progress back; the first valid day that was not stored does.
+    stored_through = chunk_start - timedelta(days=1)
+    for day, _ in split_date_range(chunk_start, chunk_end, 1):
+        day_str = day.isoformat()
+        if day_str in valid_dates and day_str not in stored_dates:
+            break
+        stored_through = day
+    return stored_through
+
+def backfill_location(location, start_date, end_date, chunk_days, rate_limiter, progress, progress_path):
+    location_key = str(location['id'])
+    completed_through = progress['completed_through'].get(location_key)
+    if completed_through is not None:
+        start_date = max(start_date, date.fromisoformat(completed_through) + timedelta(days=1))
+    if start_date > end_date:
+        return 0
+
+    existing_records = get_weather_history_from_db(location['id'], start_date, end_date)
+    missing_ranges = find_missing_date_ranges(existing_records, start_date, end_date)
+    stored_count = 0
+
+    for range_start, range_end in missing_ranges:
+        for chunk_start, chunk_end in split_date_range(range_start, range_end, chunk_days):
+            rate_limiter.wait()
+            api_data = fetch_historical_weather_data(
+                float(location['latitude']), float(location['longitude']), chunk_start, chunk_end, 'auto'
+            )
+            valid_dates = {record['weather_date'] for record in build_weather_history_records(location['id'], api_data)}
+            stored_records = store_weather_history(location['id'], api_data)
+            stored_count += len(stored_records)
+
+            stored_through = get_stored_through(
+                chunk_start, chunk_end, valid_dates, {record['weather_date'] for record in stored_records}
+            )
+            if stored_through >= chunk_start:
+                progress['completed_through'][location_key] = stored_through.isoformat()
+                save_progress(progress_path, progress)
+            if stored_through < chunk_end:
+                raise Exception(
+                    f"stored {len(stored_records)} of {len(valid_dates)} records for {chunk_start} to {chunk_end}, "
+                    f"resuming from {stored_through + timedelta(days=1)}"
+                )
+
+    progress['completed_through'][location_key] = end_date.isoformat()
+    save_progress(progress_path, progress)
+    return stored_count
+
+def run_backfill(start_date, end_date, location_ids=None, chunk_days=None, requests_per_minute=None, progress_path=None):
+    chunk_days = chunk_days or Config.HISTORY_BACKFILL_CHUNK_DAYS
+    requests_per_minute = Config.HISTORY_BACKFILL_REQUESTS_PER_MINUTE if requests_per_minute is None else requests_per_minute
+    rate_limiter = RateLimiter(requests_per_minute)
+    progress = load_progress(progress_path, start_date, end_date)
+
+    locations = get_backfill_locations(location_ids)
+    print(f"Backfilling weather history for {len(locations)} locations from {start_date} to {end_date}")
+
+    summary = {'locations': len(locations), 'completed': 0, 'failed': 0, 'records': 0}
+    for index, location in enumerate(locations, start=1):
+        try:
+            stored_count = backfill_location(
+                location, start_date, end_date, chunk_days, rate_limiter, progress, progress_path
+            )
+            summary['completed'] += 1
+            summary['records'] += stored_count
+            print(f"[{index}/{len(locations)}] {location['name']}: stored {stored_count} records")
+        except Exception as e:
+            summary['failed'] += 1
+            print(f"[{index}/{len(locations)}] {location['name']}: backfill failed, will resume on the next run: {e}")
+
+    print(
+        f"Backfill finished: {summary['completed']} locations completed, {summary['failed']} failed, "
+        f"{summary['records']} records stored"
+    )
+    return summary
+
+def parse_location_id(value):
+    return int(value) if value.isdigit() else value
+
+def main():
+    default_end_date = date.today() - timedelta(days=1)
+
+    parser = argparse.ArgumentParser(description='Backfill location_history from the historical weather archive.')
+    parser.add_argument('--location-id', action='append', dest='location_ids', type=parse_location_id, help='only backfill this location (repeatable)')
+    parser.add_argument('--start-date', type=date.fromisoformat, help='first day to backfill (YYYY-MM-DD)')
+    parser.add_argument('--end-date', type=date.fromisoformat, default=default_end_date, help='last day to backfill (YYYY-MM-DD)')
+    parser.add_argument('--days', type=int, default=Config.HISTORY_BACKFILL_DAYS, help='span to backfill when --start-date is omitted')
+    parser.add_argument('--chunk-days', type=int, default=Config.HISTORY_BACKFILL_CHUNK_DAYS, help='days fetched per archive request')
+    parser.add_argument('--requests-per-minute', type=float, default=Config.HISTORY_BACKFILL_REQUESTS_PER_MINUTE)
+    parser.add_argument('--progress-file', default=Config.HISTORY_BACKFILL_PROGRESS_PATH, help='resume state; empty to disable')
+    args = parser.parse_args()
+
+    start_date = args.start_date or args.end_date - timedelta(days=args.days - 1)
+    if start_date > args.end_date:
+        parser.error('start date must be on or before end date')
+
+    summary = run_backfill(
+        start_date, args.end_date,
+        location_ids=args.location_ids,
+        chunk_days=args.chunk_days,
+        requests_per_minute=args.requests_per_minute,
+        progress_path=args.progress_file
+    )
+    if summary['failed']:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
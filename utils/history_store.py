@@ -0,0 +1,69 @@
+import json
+import sqlite3
+import threading
+from datetime import date, timedelta
+from config import Config
+
+_local = threading.local()
+
+def get_connection():
+    connection = getattr(_local, 'connection', None)
+    if connection is None:
+        connection = sqlite3.connect(Config.WEATHER_HISTORY_STORE_PATH, timeout=5)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS location_history ('
+            'location_id TEXT NOT NULL, '
+            'weather_date TEXT NOT NULL, '
+            'record TEXT NOT NULL, '
+            'PRIMARY KEY (location_id, weather_date)'
+            ') WITHOUT ROWID'
+        )
+        _local.connection = connection
+    return connection
+
+def is_enabled():
+    return bool(Config.WEATHER_HISTORY_STORE_PATH)
+
+def get_final_date():
+    return (date.today() - timedelta(days=Config.WEATHER_HISTORY_FINAL_AFTER_DAYS)).strftime('%Y-%m-%d')
+
+def get_records(location_id, start_date, end_date):
+    if not is_enabled():
+        return []
+    
+    try:
+        rows = get_connection().execute(
+            'SELECT record FROM location_history '
+            'WHERE location_id = ? AND weather_date BETWEEN ? AND ? '
+            'ORDER BY weather_date',
+            (str(location_id), start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+    except sqlite3.Error as e:
+        print(f"Error reading local weather history: {e}")
+        return []
+
+def put_records(weather_records):
+    if not is_enabled() or not weather_records:
+        return
+    
+    final_date = get_final_date()
+    rows = [
+        (str(record['location_id']), record['weather_date'], json.dumps(record))
+        for record in weather_records
+        if record['weather_date'] <= final_date
+    ]
+    if not rows:
+        return
+    
+    try:
+        connection = get_connection()
+        with connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO location_history (location_id, weather_date, record) VALUES (?, ?, ?)',
+                rows
+            )
+    except sqlite3.Error as e:
+        print(f"Error writing local weather history: {e}")
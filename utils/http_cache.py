@@ -0,0 +1,82 @@
+import gzip
+import hashlib
+import json
+import time
+from flask import request, jsonify, Response
+from config import Config
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/html', 'text/css', 'application/javascript'}
+
+def build_etag(*parts):
+    digest = hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()[:32]
+
+def get_forecast_max_age(api_data):
+    fetched_at = api_data.get('fetched_at')
+    if fetched_at is None:
+        return 0
+    return max(0, int(Config.FORECAST_CACHE_TTL - (time.time() - fetched_at)))
+
+def is_not_modified(etag):
+    if_none_match = request.if_none_match
+    if not if_none_match:
+        return False
+    return any(
+        if_none_match.contains(variant)
+        for variant in (etag, f'{etag}-gzip', f'{etag}-br')
+    )
+
+def set_cache_headers(response, etag, max_age):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'private, max-age={max_age}'
+    return response
+
+def not_modified_response(etag, max_age):
+    response = Response(status=304)
+    return set_cache_headers(response, etag, max_age)
+
+def conditional_jsonify(payload, etag, max_age):
+    return set_cache_headers(jsonify(payload), etag, max_age)
+
+def choose_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+def compress_response(response):
+    response.vary.add('Accept-Encoding')
+    
+    if (response.status_code != 200 or response.direct_passthrough or 
+            'Content-Encoding' in response.headers or 
+            response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    
+    data = response.get_data()
+    if len(data) < Config.RESPONSE_COMPRESSION_MIN_BYTES:
+        return response
+    
+    encoding = choose_encoding()
+    if encoding is None:
+        return response
+    
+    if encoding == 'br':
+        compressed = brotli.compress(data, quality=Config.RESPONSE_BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(data, compresslevel=Config.RESPONSE_GZIP_LEVEL)
+    
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    
+    etag, is_weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{encoding}', weak=is_weak)
+    
+    return response
@@ -1,84 +1,86 @@
-from supabase import create_client, Client
+from decimal import Decimal, ROUND_HALF_UP
 from config import Config
+from services.cache import TTLCache
+from utils import db
 
-supabase: Client = create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY)
+# Locations are deduplicated on coordinates rounded to 4 decimal places (~11 m),
+# stored as a fixed-point "lat:lon" key so lookups are exact index hits.
+GRID_SCALE = Decimal(10000)
 
+location_id_cache = TTLCache(Config.LOCATION_ID_CACHE_MAX_ENTRIES, Config.LOCATION_ID_CACHE_TTL)
 
-def find_or_create_location(name, latitude, longitude):
-    rounded_lat = round(float(latitude), 4)
-    rounded_lon = round(float(longitude), 4)
+def get_location_grid_key(latitude, longitude):
+    lat_units = (Decimal(str(latitude)) * GRID_SCALE).quantize(Decimal("1"), ROUND_HALF_UP)
+    lon_units = (Decimal(str(longitude)) * GRID_SCALE).quantize(Decimal("1"), ROUND_HALF_UP)
+    return f"{lat_units}:{lon_units}"
 
-    try:
-        lat_range = 0.00005
-        lon_range = 0.00005
-
-        existing_locations = (
-            supabase.table("locations")
-            .select("id, name, latitude, longitude")
-            .gte("latitude", rounded_lat - lat_range)
-            .lte("latitude", rounded_lat + lat_range)
-            .gte("longitude", rounded_lon - lat_range)
-            .lte("longitude", rounded_lon + lat_range)
-            .execute()
-        )
 
-        for loc in existing_locations.data:
-            existing_rounded_lat = round(float(loc["latitude"]), 4)
-            existing_rounded_lon = round(float(loc["longitude"]), 4)
+def find_location_id_by_grid_key(grid_key):
+    existing_locations = (
+        db.table("locations")
+        .select("id, name")
+        .eq("grid_key", grid_key)
+        .limit(1)
+        .execute()
+    )
 
-            if (
-                existing_rounded_lat == rounded_lat
-                and existing_rounded_lon == rounded_lon
-            ):
-                print(
-                    f"Found existing location: {loc['name']} at {existing_rounded_lat}, {existing_rounded_lon}"
-                )
-                return loc["id"]
+    if not existing_locations.data:
+        return None
 
-    except Exception as e:
-        print(f"Error searching for existing location: {e}")
+    location_id = existing_locations.data[0]["id"]
+    location_id_cache.set(grid_key, location_id)
+    return location_id
+
+
+def find_or_create_location(name, latitude, longitude):
+    grid_key = get_location_grid_key(latitude, longitude)
 
-    new_location = {"name": name, "latitude": latitude, "longitude": longitude}
+    location_id = location_id_cache.get(grid_key)
+    if location_id is not None:
+        return location_id
 
     try:
-        response = supabase.table("locations").insert(new_location).execute()
-        print(f"Created new location: {name} at {latitude}, {longitude}")
-        return response.data[0]["id"]
+        location_id = find_location_id_by_grid_key(grid_key)
+        if location_id is not None:
+            print(f"Found existing location: {name} at grid {grid_key}")
+            return location_id
 
     except Exception as e:
-        error_msg = str(e).lower()
-
-        if "duplicate key" in error_msg or "unique constraint" in error_msg:
-            print(f"Unique constraint violation for {name}, searching again...")
+        print(f"Error searching for existing location: {e}")
 
-            existing_locations = (
-                supabase.table("locations")
-                .select("id, name, latitude, longitude")
-                .execute()
-            )
+    new_location = {
+        "name": name,
+        "latitude": latitude,
+        "longitude": longitude,
+        "grid_key": grid_key,
+    }
 
-            for loc in existing_locations.data:
-                existing_rounded_lat = round(float(loc["latitude"]), 4)
-                existing_rounded_lon = round(float(loc["longitude"]), 4)
+    response = (
+        db.table("locations")
+        .upsert(new_location, on_conflict="grid_key", ignore_duplicates=True)
+        .execute()
+    )
 
-                if (
-                    existing_rounded_lat == rounded_lat
-                    and existing_rounded_lon == rounded_lon
-                ):
-                    print(f"Found location after constraint violation: {loc['name']}")
-                    return loc["id"]
+    if response.data:
+        print(f"Created new location: {name} at {latitude}, {longitude}")
+        location_id = response.data[0]["id"]
+        location_id_cache.set(grid_key, location_id)
+        return location_id
 
-            raise Exception(
-                f"Could not find or create location {name} at {latitude}, {longitude}"
-            )
+    location_id = find_location_id_by_grid_key(grid_key)
+    if location_id is not None:
+        print(f"Found location created concurrently: {name} at grid {grid_key}")
+        return location_id
 
-        raise e
+    raise Exception(
+        f"Could not find or create location {name} at {latitude}, {longitude}"
+    )
 
 
 def get_user_locations(user_id):
 
     user_locations_response = (
-        supabase.table("user_locations")
+        db.table("user_locations")
         .select("*, locations(*)")
         .eq("user_id", user_id)
         .order("added_at", desc=True)
@@ -104,7 +106,7 @@ def get_user_locations(user_id):
 def save_user_location(user_id, location_id, custom_name=None):
 
     existing_user_location = (
-        supabase.table("user_locations")
+        db.table("user_locations")
         .select("*")
         .eq("user_id", user_id)
         .eq("location_id", location_id)
@@ -120,14 +122,14 @@ def save_user_location(user_id, location_id, custom_name=None):
         "custom_name": custom_name,
     }
 
-    response = supabase.table("user_locations").insert(new_user_location).execute()
+    response = db.table("user_locations").insert(new_user_location).execute()
     return response.data[0], "Location added to your saved locations"
 
 
 def remove_user_location(user_id, user_location_id):
 
     user_location_response = (
-        supabase.table("user_locations")
+        db.table("user_locations")
         .select("custom_name, locations(name)")
         .eq("id", user_location_id)
         .eq("user_id", user_id)
@@ -140,7 +142,7 @@ def remove_user_location(user_id, user_location_id):
     user_location = user_location_response.data[0]
     location_name = user_location["custom_name"] or user_location["locations"]["name"]
 
-    supabase.table("user_locations").delete().eq("id", user_location_id).eq(
+    db.table("user_locations").delete().eq("id", user_location_id).eq(
         "user_id", user_id
     ).execute()
 
@@ -150,7 +152,7 @@ def remove_user_location(user_id, user_location_id):
 def get_user_location_with_details(user_id, user_location_id):
     
     user_location = (
-        supabase.table("user_locations")
+        db.table("user_locations")
         .select("*, locations(*)")
         .eq("id", user_location_id)
         .eq("user_id", user_id)
@@ -1,21 +1,23 @@
-from supabase import create_client, Client
+from flask import request
+from itsdangerous import URLSafeTimedSerializer, BadSignature
 from config import Config
+from utils import db
 
-supabase: Client = create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY)
+auth_token_serializer = URLSafeTimedSerializer(Config.SECRET_KEY, salt='auth-token')
 
 def get_user_id_by_email(email):
-    user_response = supabase.table('users').select("id").eq('email', email).execute()
+    user_response = db.table('users').select("id").eq('email', email).execute()
     if not user_response.data:
         raise ValueError('User not found')
     return user_response.data[0]['id']
 
 def create_user(email):
     new_user = {'email': email}
-    response = supabase.table('users').insert(new_user).execute()
+    response = db.table('users').insert(new_user).execute()
     return response.data[0]
 
 def get_user_by_email(email):
-    response = supabase.table('users').select("*").eq('email', email).execute()
+    response = db.table('users').select("*").eq('email', email).execute()
     return response.data[0] if response.data else None
 
 def validate_email(email):
@@ -25,4 +27,33 @@ def validate_email(email):
     if '@' not in email or '.' not in email:
         return False, 'Invalid email format'
     
-    return True, ''
\ No newline at end of file
+    return True, ''
+
+def create_auth_token(user_id, email):
+    return auth_token_serializer.dumps({'user_id': user_id, 'email': email})
+
+def get_user_id_from_token(token, email=None):
+    try:
+        payload = auth_token_serializer.loads(token, max_age=Config.AUTH_TOKEN_MAX_AGE)
+    except BadSignature:
+        return None
+    
+    if email and payload.get('email') != email:
+        return None
+    
+    return payload.get('user_id')
+
+def get_request_token():
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        return auth_header[len('Bearer '):].strip()
+    return None
+
+def get_request_user_id(email):
+    token = get_request_token()
+    if token:
+        user_id = get_user_id_from_token(token, email)
+        if user_id is not None:
+            return user_id
+    
+    return get_user_id_by_email(email)
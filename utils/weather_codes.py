@@ -23,25 +23,46 @@ def get_weather_icon(weather_code, is_day=1):
     else:
         return "☀️" if is_day else "🌙"
 
+WEATHER_DESCRIPTIONS = {
+    0: "Clear sky",
+    1: "Mainly clear",
+    2: "Partly cloudy",
+    3: "Overcast",
+    45: "Fog",
+    48: "Depositing rime fog",
+    51: "Light drizzle",
+    53: "Moderate drizzle",
+    55: "Dense drizzle",
+    61: "Slight rain",
+    63: "Moderate rain",
+    65: "Heavy rain",
+    71: "Slight snow fall",
+    73: "Moderate snow fall",
+    75: "Heavy snow fall",
+    95: "Thunderstorm",
+    96: "Thunderstorm with slight hail",
+    99: "Thunderstorm with heavy hail"
+}
+
 def get_weather_description(weather_code):
-    descriptions = {
-        0: "Clear sky",
-        1: "Mainly clear",
-        2: "Partly cloudy",
-        3: "Overcast",
-        45: "Fog",
-        48: "Depositing rime fog",
-        51: "Light drizzle",
-        53: "Moderate drizzle",
-        55: "Dense drizzle",
-        61: "Slight rain",
-        63: "Moderate rain",
-        65: "Heavy rain",
-        71: "Slight snow fall",
-        73: "Moderate snow fall",
-        75: "Heavy snow fall",
-        95: "Thunderstorm",
-        96: "Thunderstorm with slight hail",
-        99: "Thunderstorm with heavy hail"
-    }
-    return descriptions.get(weather_code, "Unknown")
\ No newline at end of file
+    return WEATHER_DESCRIPTIONS.get(weather_code, "Unknown")
+
+# WMO codes run 0-99, so descriptions and icons for a whole column can be
+# resolved by indexing instead of a dict lookup or if/elif chain per row.
+WEATHER_CODE_COUNT = 100
+DESCRIPTION_LOOKUP = tuple(get_weather_description(code) for code in range(WEATHER_CODE_COUNT))
+DAY_ICON_LOOKUP = tuple(get_weather_icon(code, 1) for code in range(WEATHER_CODE_COUNT))
+
+def get_weather_descriptions(weather_codes):
+    return [
+        DESCRIPTION_LOOKUP[code] if type(code) is int and 0 <= code < WEATHER_CODE_COUNT
+        else get_weather_description(code)
+        for code in weather_codes
+    ]
+
+def get_day_weather_icons(weather_codes):
+    return [
+        DAY_ICON_LOOKUP[code] if type(code) is int and 0 <= code < WEATHER_CODE_COUNT
+        else get_weather_icon(code, 1)
+        for code in weather_codes
+    ]
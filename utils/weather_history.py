@@ -1,14 +1,15 @@
 from datetime import datetime, timedelta
-from supabase import create_client, Client
 from config import Config
+from utils import db
 from utils.weather_codes import get_weather_description
+from services.weather_api import fetch_historical_weather_data
+from utils import history_store
+from utils.climate_aggregates import schedule_climate_aggregates_update
 
-supabase: Client = create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY)
-
-def store_weather_history(location_id, weather_data):
+def build_weather_history_records(location_id, weather_data):
 
     daily_data = weather_data['daily']
-    stored_records = []
+    weather_records = []
     
     for i, date_str in enumerate(daily_data['time']):
         temp_max = daily_data['temperature_2m_max'][i]
@@ -22,7 +23,7 @@ def store_weather_history(location_id, weather_data):
             print(f"Skipping {date_str} - missing essential weather data")
             continue
         
-        weather_record = {
+        weather_records.append({
             'location_id': location_id,
             'weather_date': date_str,
             'temperature_max': float(temp_max),
@@ -32,47 +33,119 @@ def store_weather_history(location_id, weather_data):
             'wind_speed': float(wind_speed) if wind_speed is not None else 0.0,
             'weather_condition': str(int(weather_code)),
             'weather_description': get_weather_description(int(weather_code))
-        }
+        })
+    
+    return weather_records
+
+def upsert_weather_history_records(weather_records):
+    try:
+        result = db.table('location_history').upsert(weather_records, on_conflict='location_id,weather_date').execute()
+        return result.data
+    except Exception as e:
+        if not db.is_row_error(e):
+            raise
         
-        try:
-            result = supabase.table('location_history').upsert(weather_record, on_conflict='location_id,weather_date').execute()
-            stored_records.append(result.data[0])
-        except Exception as e:
-            print(f"Error storing weather record for {date_str}: {e}")
-            continue
+        if len(weather_records) == 1:
+            print(f"Error storing weather record for {weather_records[0]['weather_date']}: {e}")
+            return []
+        
+        print(f"Error storing {len(weather_records)} weather records, retrying in smaller chunks: {e}")
+        middle = len(weather_records) // 2
+        return (upsert_weather_history_records(weather_records[:middle]) + 
+                upsert_weather_history_records(weather_records[middle:]))
+
+def store_weather_history(location_id, weather_data):
+
+    weather_records = build_weather_history_records(location_id, weather_data)
+    chunk_size = Config.WEATHER_HISTORY_UPSERT_CHUNK_SIZE
+    stored_records = []
+    
+    for start in range(0, len(weather_records), chunk_size):
+        stored_records.extend(upsert_weather_history_records(weather_records[start:start + chunk_size]))
+    
+    history_store.put_records(stored_records)
+    schedule_climate_aggregates_update(location_id, stored_records)
     
     return stored_records
 
 def get_weather_history_from_db(location_id, start_date, end_date):
+    local_records = history_store.get_records(location_id, start_date, end_date)
+    missing_ranges = find_missing_date_ranges(local_records, start_date, end_date)
+    
+    if not missing_ranges:
+        return local_records
+    
+    remote_records = get_weather_history_from_supabase(location_id, missing_ranges[0][0], missing_ranges[-1][1])
+    history_store.put_records(remote_records)
+    
+    return merge_weather_history_records(local_records, remote_records)
+
+def get_weather_history_from_supabase(location_id, start_date, end_date):
+    page_size = Config.WEATHER_HISTORY_PAGE_SIZE
+    weather_records = []
+    last_date = None
+    
     try:
-        result = (supabase.table('location_history')
-                 .select("*")
-                 .eq('location_id', location_id)
-                 .gte('weather_date', start_date.strftime('%Y-%m-%d'))
-                 .lte('weather_date', end_date.strftime('%Y-%m-%d'))
-                 .order('weather_date')
-                 .limit(50)
-                 .execute())
-        
-        return result.data
+        while True:
+            query = (db.table('location_history')
+                     .select("*")
+                     .eq('location_id', location_id)
+                     .lte('weather_date', end_date.strftime('%Y-%m-%d')))
+            
+            if last_date is None:
+                query = query.gte('weather_date', start_date.strftime('%Y-%m-%d'))
+            else:
+                query = query.gt('weather_date', last_date)
+            
+            page = query.order('weather_date').limit(page_size).execute().data
+            weather_records.extend(page)
+            
+            if len(page) < page_size:
+                return weather_records
+            last_date = page[-1]['weather_date']
     except Exception as e:
         print(f"Error retrieving weather history: {e}")
-        return []
+        return weather_records
 
-def check_weather_history_completeness(location_id, start_date, end_date):
-    existing_records = get_weather_history_from_db(location_id, start_date, end_date)
-    
-    expected_days = (end_date - start_date).days + 1
+def split_date_range(start_date, end_date, chunk_days):
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end_date)
+        yield chunk_start, chunk_end
+        chunk_start = chunk_end + timedelta(days=1)
 
-    if len(existing_records) < expected_days:
-        return False, existing_records
-    
+def find_missing_date_ranges(existing_records, start_date, end_date):
     existing_dates = {record['weather_date'] for record in existing_records}
+    missing_ranges = []
+    range_start = None
     current_date = start_date
     
     while current_date <= end_date:
         if current_date.strftime('%Y-%m-%d') not in existing_dates:
-            return False, existing_records
+            if range_start is None:
+                range_start = current_date
+        elif range_start is not None:
+            missing_ranges.append((range_start, current_date - timedelta(days=1)))
+            range_start = None
         current_date += timedelta(days=1)
     
-    return True, existing_records
\ No newline at end of file
+    if range_start is not None:
+        missing_ranges.append((range_start, end_date))
+    
+    return missing_ranges
+
+def merge_weather_history_records(existing_records, new_records):
+    records_by_date = {record['weather_date']: record for record in existing_records}
+    records_by_date.update({record['weather_date']: record for record in new_records})
+    return [records_by_date[weather_date] for weather_date in sorted(records_by_date)]
+
+def fill_weather_history_gaps(location_id, latitude, longitude, existing_records, missing_ranges):
+    stored_records = []
+    
+    for range_start, range_end in missing_ranges:
+        for chunk_start, chunk_end in split_date_range(range_start, range_end, Config.WEATHER_HISTORY_ARCHIVE_CHUNK_DAYS):
+            api_data = fetch_historical_weather_data(float(latitude), float(longitude), chunk_start, chunk_end, 'auto')
+            stored_records.extend(store_weather_history(location_id, api_data))
+    
+    print(f"Stored {len(stored_records)} weather records across {len(missing_ranges)} missing date ranges")
+    return merge_weather_history_records(existing_records, stored_records)